@@ -0,0 +1,27 @@
+-- Stories whose content is already stored under another story's article
+-- story_article_unique (004) allows one story per article, so a repost of an
+-- already-scraped URL cannot point story.article_id at that article. The scraper
+-- records the relation here instead; story_list falls back to it, so the repost
+-- shows the existing article and summary. Near-duplicates (syndicated or AMP
+-- copies) are not stored as articles at all: they are recorded here with
+-- via = 'near_dup' and the MinHash similarity, and resolve the same way.
+
+CREATE TABLE IF NOT EXISTS story_duplicate (
+  story_id    uuid PRIMARY KEY REFERENCES story(id) ON DELETE CASCADE,
+  article_id  uuid NOT NULL REFERENCES article(id) ON DELETE CASCADE,
+  via         text NOT NULL CHECK (via IN ('repost', 'near_dup')),
+  similarity  real,
+  created_at  timestamptz NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS story_duplicate_article_idx ON story_duplicate(article_id);
+
+-- A story's own article wins; otherwise the article it reposts or nearly duplicates
+CREATE OR REPLACE VIEW story_list AS
+SELECT
+  s.id, s.source, s.hn_id, s.title, s.url, s.domain, s.author,
+  s.points, s.comments_count, s.created_at, s.fetched_at,
+  COALESCE(s.article_id, sd.article_id) AS article_id,
+  rs.hot_score
+FROM story s
+LEFT JOIN story_duplicate sd ON sd.story_id = s.id
+LEFT JOIN rank_signals rs ON rs.story_id = s.id;
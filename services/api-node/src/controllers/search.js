@@ -20,8 +20,7 @@ async function search(req, res, next) {
         stags.tags, stopics.topics,
         ts_rank_cd(a.tsv, (SELECT tsq FROM q)) AS score
       FROM story_list s
-      JOIN story st ON st.id = s.id
-      JOIN article a ON a.id = st.article_id
+      JOIN article a ON a.id = s.article_id
       LEFT JOIN LATERAL (
         SELECT coalesce(json_agg(json_build_object('id', t.id, 'slug', t.slug, 'name', t.name, 'kind', t.kind) ORDER BY t.slug), '[]'::json) AS tags
         FROM story_tag st2 JOIN tag t ON t.id = st2.tag_id
@@ -165,11 +165,10 @@ async function getStoryById(req, res, next) {
       SELECT
         s.id, s.source, s.hn_id, s.title, s.url, s.domain, s.author,
         s.points, s.comments_count, s.created_at, s.fetched_at,
-        st.article_id,
+        s.article_id,
         stags.tags, stopics.topics,
         rs.hot_score, rs.decay_ts, rs.click_count, rs.dwell_ms_avg
       FROM story_list s
-      JOIN story st ON st.id = s.id
       LEFT JOIN LATERAL (
         SELECT coalesce(json_agg(json_build_object('id', t.id, 'slug', t.slug, 'name', t.name, 'kind', t.kind) ORDER BY t.slug), '[]'::json) AS tags
         FROM story_tag st2 JOIN tag t ON t.id = st2.tag_id
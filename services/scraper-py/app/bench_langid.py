@@ -0,0 +1,105 @@
+"""Compare sampled/cached language detection against full-text langid.
+
+    python -m app.bench_langid --db 2000            # random articles from Postgres
+    python -m app.bench_langid --jsonl corpus.jsonl # {"text": ..., "domain": ...} per line
+
+Reports agreement with the old full-text classification (the reference), plus
+per-document latency for each mode. Exits 1 if agreement is below --min-agreement.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from typing import List, Optional, Tuple
+
+import langid
+
+from .normalize import DomainLanguageCache, language_sample, preload_language_model
+
+
+def _load_db(limit: int) -> List[Tuple[str, Optional[str]]]:
+    from .db import get_pool
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT a.text, MIN(s.domain) FROM article a LEFT JOIN story s ON s.article_id = a.id "
+            "GROUP BY a.id ORDER BY random() LIMIT %s",
+            (limit,),
+        )
+        return [(t, d) for t, d in cur.fetchall() if t]
+
+
+def _load_jsonl(path: str) -> List[Tuple[str, Optional[str]]]:
+    docs = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            if row.get("text"):
+                docs.append((row["text"], row.get("domain")))
+    return docs
+
+
+def _ms(samples: List[float]) -> str:
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return f"mean {statistics.mean(samples) * 1000:.2f}ms  p99 {p99 * 1000:.2f}ms  total {sum(samples):.2f}s"
+
+
+def run(docs: List[Tuple[str, Optional[str]]], min_agreement: float) -> int:
+    preload_language_model()
+    full_t, sample_t, cached_t = [], [], []
+    sample_ok = cached_ok = 0
+    mismatches = []
+    cache = DomainLanguageCache()
+    for text, domain in docs:
+        t0 = time.perf_counter()
+        ref, _ = langid.classify(text)
+        full_t.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        got, _ = langid.classify(language_sample(text))
+        sample_t.append(time.perf_counter() - t0)
+        sample_ok += got == ref
+        if got != ref and len(mismatches) < 10:
+            mismatches.append((ref, got, domain, text[:80].replace("\n", " ")))
+
+        # same path as detect_language(text, domain=...) with a private cache
+        t0 = time.perf_counter()
+        lang = cache.get(domain) if domain else None
+        if lang is None:
+            lang, _ = langid.classify(language_sample(text))
+            if domain:
+                cache.observe(domain, lang)
+        cached_t.append(time.perf_counter() - t0)
+        cached_ok += lang == ref
+
+    n = len(docs)
+    print(f"documents: {n}  mean chars: {statistics.mean(len(t) for t, _ in docs):.0f}")
+    print(f"full text        {_ms(full_t)}")
+    print(f"sampled          {_ms(sample_t)}  agreement {sample_ok / n:.4f}")
+    print(f"sampled+domain   {_ms(cached_t)}  agreement {cached_ok / n:.4f}  "
+          f"domain hits {cache.hits}/{cache.hits + cache.misses}")
+    for ref, got, domain, head in mismatches:
+        print(f"  mismatch full={ref} sampled={got} domain={domain} :: {head}")
+    return 0 if min(sample_ok, cached_ok) / n >= min_agreement else 1
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--db", type=int, metavar="N", help="sample N articles from Postgres")
+    src.add_argument("--jsonl", metavar="PATH", help="corpus file, one JSON object per line")
+    ap.add_argument("--min-agreement", type=float, default=0.99)
+    args = ap.parse_args(argv)
+    docs = _load_db(args.db) if args.db else _load_jsonl(args.jsonl)
+    if not docs:
+        print("empty corpus", file=sys.stderr)
+        return 2
+    return run(docs, args.min_agreement)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
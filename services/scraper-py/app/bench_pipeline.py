@@ -0,0 +1,316 @@
+"""Offline end-to-end benchmark for the scraper hot path.
+
+Serves a fixture corpus from a local HTTP server (with injectable latency, 5xx
+and 429 responses), enqueues jobs pointing at it and drives process_one() until
+the input queue is drained. Redis and Postgres are in-memory stand-ins unless
+--redis / --pg are given (bench:* queue names are used either way).
+
+    python -m app.bench_pipeline --corpus fixtures/ --jobs 500 --latency-ms 50 --error-rate 0.02
+    python -m app.bench_pipeline --synthetic 50 --jobs 200 --json-out run.json
+    python -m app.bench_pipeline --corpus fixtures/ --baseline run.json --max-regression 0.15
+
+Reports jobs/sec and p50/p99 for each pipeline stage (fetch, decode, analyze,
+extract, langid, hash, minhash, db, enqueue). With --baseline it exits 1 when
+throughput or any stage's p50 is worse than the baseline by more than
+--max-regression.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+_CONTENT_TYPES = {".html": "text/html; charset=utf-8", ".htm": "text/html; charset=utf-8", ".pdf": "application/pdf"}
+_WORDS = ("system latency queue worker cache server request network database index model storage "
+          "protocol kernel memory thread process cluster replica commit backup deploy").split()
+
+
+# ---- fixture server ----------------------------------------------------------------
+
+class FixtureServer:
+    """Threaded HTTP server for the corpus; /p/<i>/<anything> serves document i."""
+
+    def __init__(self, docs: List[Tuple[bytes, str]], latency_ms: float, jitter_ms: float,
+                 error_rate: float, rate_limit_rate: float, seed: int) -> None:
+        self.docs = docs
+        self.counts = {"200": 0, "429": 0, "500": 0, "404": 0}
+        self._lock = threading.Lock()
+        rng = random.Random(seed)
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                with server._lock:
+                    roll, jitter = rng.random(), rng.random()
+                delay = (latency_ms + jitter * jitter_ms) / 1000.0
+                if delay > 0:
+                    time.sleep(delay)
+                parts = self.path.split("/")
+                if len(parts) < 3 or parts[1] != "p" or not parts[2].isdigit() or int(parts[2]) >= len(server.docs):
+                    return self._send(404, b"not found", "text/plain")
+                if roll < rate_limit_rate:
+                    return self._send(429, b"slow down", "text/plain", {"Retry-After": "1"})
+                if roll < rate_limit_rate + error_rate:
+                    return self._send(500, b"boom", "text/plain")
+                body, ctype = server.docs[int(parts[2])]
+                self._send(200, body, ctype)
+
+            def _send(self, status: int, body: bytes, ctype: str, extra: Optional[Dict[str, str]] = None) -> None:
+                with server._lock:
+                    server.counts[str(status)] = server.counts.get(str(status), 0) + 1
+                self.send_response(status)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                for k, v in (extra or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    def url(self, i: int, n: int) -> str:
+        return f"http://127.0.0.1:{self.port}/p/{i % len(self.docs)}/{n}"
+
+    def close(self) -> None:
+        self._httpd.shutdown()
+
+
+def _load_corpus(directory: str) -> List[Tuple[bytes, str]]:
+    docs = []
+    for path in sorted(Path(directory).rglob("*")):
+        ctype = _CONTENT_TYPES.get(path.suffix.lower())
+        if ctype and path.is_file():
+            docs.append((path.read_bytes(), ctype))
+    return docs
+
+
+def _synthetic_corpus(n: int, seed: int) -> List[Tuple[bytes, str]]:
+    rng = random.Random(seed)
+    docs = []
+    for i in range(n):
+        paras = "".join(f"<p>{' '.join(rng.choice(_WORDS) for _ in range(rng.randint(40, 120)))}.</p>"
+                        for _ in range(rng.randint(5, 40)))
+        html = (f"<html><head><title>Doc {i}</title><meta name=\"author\" content=\"Bench\"></head>"
+                f"<body><nav>home about</nav><article><h1>Doc {i}</h1>{paras}</article>"
+                f"<script>var x = {i};</script></body></html>")
+        docs.append((html.encode("utf-8"), _CONTENT_TYPES[".html"]))
+    return docs
+
+
+# ---- in-memory stand-ins -------------------------------------------------------------
+
+class _MemoryDB:
+    """Replaces the Postgres writes with dicts (same return values)."""
+
+    def __init__(self) -> None:
+        self.articles: Dict[str, Tuple[str, str, str]] = {}  # content_hash -> (id, language, text)
+        self.links: Dict[str, str] = {}
+        self.duplicates: Dict[str, Tuple[str, str]] = {}  # story_id -> (article_id, via)
+        self._lock = threading.Lock()
+
+    def write_rows(self, rows: List[Any]) -> Dict[str, str]:
+        return {r.content_hash: self.write_row(r) for r in rows}
+
+    def write_row(self, row: Any) -> str:
+        with self._lock:
+            if row.content_hash not in self.articles:
+                self.articles[row.content_hash] = (str(uuid.uuid4()), row.language, row.text)
+            article_id = self.articles[row.content_hash][0]
+            self.links[row.story_id] = article_id
+        return article_id
+
+    def link_existing(self, article_id: str, story_id: str, domain: str, author: Optional[str],
+                      via: str = "repost", score: Optional[float] = None):
+        with self._lock:
+            for aid, lang, text in self.articles.values():
+                if aid == article_id:
+                    if via != "repost" or (article_id in self.links.values()
+                                           and self.links.get(story_id) != article_id):
+                        self.duplicates[story_id] = (article_id, via)
+                    else:
+                        self.links[story_id] = article_id
+                    return lang, text
+        return None
+
+
+def _install_stand_ins(use_redis: bool, use_pg: bool) -> Optional[_MemoryDB]:
+    from . import db, main, redis_io
+    if not use_redis:
+        import fakeredis  # type: ignore
+        server = fakeredis.FakeServer()
+
+        class _Sync:
+            @staticmethod
+            def from_url(url: str, **kw: Any) -> Any:
+                return fakeredis.FakeRedis(server=server, decode_responses=True)
+
+        class _Async:
+            @staticmethod
+            def from_url(url: str, **kw: Any) -> Any:
+                return fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+
+        redis_io.Redis = _Sync
+        redis_io.AsyncRedis = _Async
+    if use_pg:
+        return None
+    mem = _MemoryDB()
+    db._write_rows = mem.write_rows
+    db._write_row = mem.write_row
+    main._link_existing_article = mem.link_existing
+    return mem
+
+
+# ---- measurement -------------------------------------------------------------------
+
+def _pct(samples: List[float], q: float) -> float:
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(len(s) * q))]
+
+
+def _summarize(stages: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+    return {
+        name: {
+            "count": len(v),
+            "p50_ms": _pct(v, 0.50) * 1000,
+            "p99_ms": _pct(v, 0.99) * 1000,
+            "mean_ms": statistics.mean(v) * 1000,
+        }
+        for name, v in sorted(stages.items()) if v
+    }
+
+
+def _compare(result: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    problems = []
+    base_rate, rate = baseline.get("jobs_per_sec") or 0, result["jobs_per_sec"]
+    if base_rate and rate < base_rate * (1 - max_regression):
+        problems.append(f"jobs/sec {rate:.2f} < baseline {base_rate:.2f}")
+    for name, cur in result["stages"].items():
+        base = (baseline.get("stages") or {}).get(name)
+        if base and base["p50_ms"] > 0 and cur["p50_ms"] > base["p50_ms"] * (1 + max_regression):
+            problems.append(f"{name} p50 {cur['p50_ms']:.2f}ms > baseline {base['p50_ms']:.2f}ms")
+    return problems
+
+
+def run(args: argparse.Namespace) -> int:
+    docs = _synthetic_corpus(args.synthetic, args.seed) if args.synthetic else _load_corpus(args.corpus)
+    if not docs:
+        print(f"no fixtures (*.html, *.htm, *.pdf) under {args.corpus}", file=sys.stderr)
+        return 2
+
+    # env must be in place before app modules read config; queue names are always
+    # forced to bench:* since the run deletes them
+    os.environ["REDIS_URL"] = args.redis or "redis://bench.invalid/0"
+    os.environ["PG_DSN"] = args.pg or "postgresql://bench.invalid/bench"
+    os.environ.update({
+        "INPUT_QUEUE": "bench:scraper:in", "SUMMARIZER_QUEUE": "bench:summarizer:in",
+        "RETRY_QUEUE": "bench:scraper:retry", "DLQ": "bench:scraper:dlq",
+    })
+    for key, value in {
+        "HEADLESS_ENABLED": "false", "FETCH_CACHE_DIR": "", "CANON_INDEX_TTL_S": "0",
+        "NEAR_DUP_THRESHOLD": "0", "LOG_LEVEL": "error",
+    }.items():
+        os.environ.setdefault(key, value)
+
+    from .config import load_config
+    from .extract_pool import get_extract_pool, close_extract_pool
+    from .main import process_one
+    from .redis_io import client, delayed_key, rpush
+    from .stages import add_stage_observer, remove_stage_observer
+
+    mem = _install_stand_ins(bool(args.redis), bool(args.pg))
+    cfg = load_config()
+    server = FixtureServer(docs, args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit_rate, args.seed)
+
+    stages: Dict[str, List[float]] = {}
+    observer = lambda name, seconds: stages.setdefault(name, []).append(seconds)  # noqa: E731
+    try:
+        r = client()
+        for key in (cfg.input_queue, cfg.summarizer_queue, cfg.retry_queue, cfg.dlq, delayed_key(cfg.retry_queue)):
+            r.delete(key)
+        for n in range(args.jobs):
+            rpush(cfg.input_queue, {
+                "trace_id": f"bench-{n}",
+                "story": {"id": str(uuid.uuid4()), "url": server.url(n, n), "title": f"Bench story {n}",
+                          "source": "hn", "hn_id": n, "created_at": "2024-01-01T00:00:00Z"},
+                "attempt": 0,
+            })
+        asyncio.run(get_extract_pool().start())  # warm-up is not part of the measurement
+
+        add_stage_observer(observer)
+        done = 0
+        t0 = last = time.perf_counter()
+        while done < args.jobs and process_one():
+            done += 1
+            last = time.perf_counter()
+        elapsed = last - t0
+
+        result = {
+            "jobs": done,
+            "elapsed_s": elapsed,
+            "jobs_per_sec": done / elapsed if elapsed > 0 else 0.0,
+            "outcomes": {
+                "enqueued": r.llen(cfg.summarizer_queue),
+                "dlq": r.llen(cfg.dlq),
+                "retry_pending": r.zcard(delayed_key(cfg.retry_queue)),
+            },
+            "server": dict(server.counts),
+            "stages": _summarize(stages),
+            "articles": len(mem.articles) if mem else None,
+        }
+    finally:
+        remove_stage_observer(observer)
+        server.close()
+        close_extract_pool()
+
+    print(f"jobs {result['jobs']}  elapsed {result['elapsed_s']:.2f}s  jobs/sec {result['jobs_per_sec']:.2f}")
+    print(f"outcomes {result['outcomes']}  server {result['server']}")
+    print(f"{'stage':<10}{'count':>7}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    for name, st in result["stages"].items():
+        print(f"{name:<10}{st['count']:>7}{st['p50_ms']:>10.2f}{st['p99_ms']:>10.2f}{st['mean_ms']:>10.2f}")
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(result, indent=2))
+    if args.baseline:
+        problems = _compare(result, json.loads(Path(args.baseline).read_text()), args.max_regression)
+        for p in problems:
+            print(f"REGRESSION: {p}")
+        return 1 if problems else 0
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--corpus", metavar="DIR", help="fixture pages (*.html, *.htm, *.pdf)")
+    src.add_argument("--synthetic", type=int, metavar="N", help="generate N article-like pages instead")
+    ap.add_argument("--jobs", type=int, default=200)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction of responses that are 500s")
+    ap.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of responses that are 429s")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--redis", metavar="URL", help="use a real Redis instead of fakeredis")
+    ap.add_argument("--pg", metavar="DSN", help="use a real Postgres instead of in-memory writes")
+    ap.add_argument("--json-out", metavar="PATH")
+    ap.add_argument("--baseline", metavar="PATH", help="earlier --json-out to compare against")
+    ap.add_argument("--max-regression", type=float, default=0.15)
+    return run(ap.parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,96 @@
-from typing import Union
+import codecs
+import re
+from typing import Optional, Union
 from charset_normalizer import from_bytes
 
 
-def decode_body(body: Union[bytes, bytearray, str]) -> str:
-    if isinstance(body, (bytes, bytearray)):
-        res = from_bytes(body).best()
-        if res is None:
-            return body.decode('utf-8', errors='ignore')
-        return str(res)
-    return str(body)
+SNIFF_BYTES = 4096  # <meta charset> must appear within the first 1024 bytes per spec; be generous
 
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+_HEADER_CHARSET_RE = re.compile(r"charset\s*=\s*[\"']?([\w.:-]+)", re.I)
+# covers <meta charset="x"> and <meta http-equiv=... content="text/html; charset=x">
+_META_CHARSET_RE = re.compile(rb"<meta[^>]{0,512}?charset\s*=\s*[\"']?\s*([\w.:-]+)", re.I)
+_XML_ENCODING_RE = re.compile(rb"^\s*<\?xml[^>]{0,200}?encoding\s*=\s*[\"']([\w.:-]+)", re.I)
+# labels browsers decode as windows-1252; pages mislabelled this way are often really UTF-8
+_WESTERN = {"ascii", "latin_1", "cp1252", "iso8859_1"}
+
+
+def _codec(label: Union[str, bytes, None]) -> Optional[str]:
+    if not label:
+        return None
+    if isinstance(label, bytes):
+        label = label.decode("ascii", errors="ignore")
+    try:
+        return codecs.lookup(label.strip()).name
+    except LookupError:
+        return None
+
+
+def _try(body: bytes, encoding: str) -> Optional[str]:
+    try:
+        return body.decode(encoding)
+    except (UnicodeDecodeError, LookupError):
+        return None
+
+
+def _decode_declared(body: bytes, encoding: str) -> Optional[str]:
+    if encoding.replace("-", "_") in _WESTERN:
+        if not body.isascii():
+            as_utf8 = _try(body, "utf-8")
+            if as_utf8 is not None:
+                return as_utf8
+        return _try(body, "cp1252")
+    return _try(body, encoding)
+
+
+def declared_encoding(body: bytes, content_type: Optional[str] = None) -> Optional[str]:
+    """Encoding from a BOM, the Content-Type charset or a meta/XML declaration, in that order."""
+    for bom, name in _BOMS:
+        if body.startswith(bom):
+            return name
+    m = _HEADER_CHARSET_RE.search(content_type or "")
+    enc = _codec(m.group(1)) if m else None
+    if enc:
+        return enc
+    head = body[:SNIFF_BYTES]
+    m = _META_CHARSET_RE.search(head) or _XML_ENCODING_RE.search(head)
+    enc = _codec(m.group(1)) if m else None
+    # an in-document utf-16 label can't be true for a document we could read as ASCII
+    return "utf-8" if enc and enc.startswith("utf-16") else enc
+
+
+def decode_body(body: Union[bytes, bytearray, str], content_type: Optional[str] = None,
+                utf8: bool = False) -> str:
+    """Decode a fetched body, trusting declared encodings before statistical detection.
+
+    `utf8=True` is for bytes we encoded ourselves (headless renders). Otherwise a
+    BOM, the Content-Type charset or a <meta charset> in the first SNIFF_BYTES
+    wins; undeclared bodies are tried as UTF-8. charset_normalizer only runs when
+    none of that decodes cleanly.
+    """
+    if not isinstance(body, (bytes, bytearray)):
+        return str(body)
+    body = bytes(body)
+    if utf8:
+        return body.decode("utf-8", errors="ignore")
+
+    enc = declared_encoding(body, content_type)
+    if enc:
+        text = _decode_declared(body, enc)
+        if text is not None:
+            return text
+    else:
+        text = _try(body, "utf-8")
+        if text is not None:
+            return text
+
+    res = from_bytes(body).best()
+    if res is None:
+        return body.decode('utf-8', errors='ignore')
+    return str(res)
@@ -0,0 +1,68 @@
+"""Per-domain circuit breaker, shared by all workers through Redis.
+
+closed: jobs fetch normally. CIRCUIT_FAILURE_THRESHOLD consecutive fetch failures
+(plain fetch and any headless fallback both failed; failures further apart than
+CIRCUIT_WINDOW_S are forgotten) trip it to
+
+open: jobs for the domain are parked in the delayed retry set until the
+cool-down (CIRCUIT_OPEN_S) ends, without using a worker slot, a fetch timeout
+or the browser, and without spending one of their retries. After it,
+
+half_open: the first job through is the probe; everybody else keeps waiting.
+A successful probe closes the circuit, a failed one reopens it with double the
+previous cool-down (capped at CIRCUIT_MAX_OPEN_S).
+
+Redis being unavailable never blocks a fetch: admit() then lets the job through.
+"""
+from typing import NamedTuple
+
+from .config import load_config
+from .logging import logger
+from .metrics import CIRCUIT_TRANSITIONS
+from .redis_io import acircuit_admit, acircuit_report
+
+
+class Admission(NamedTuple):
+    allowed: bool
+    retry_at_ms: int = 0  # when a refused job should come back
+    clean: bool = True  # closed with no failures on record: a success needn't be reported
+
+
+_PASS = Admission(True)
+
+
+def _probe_ttl_ms(cfg) -> int:
+    # long enough for the probe's plain fetch plus a headless fallback
+    return cfg.fetch_timeout_ms + cfg.headless_timeout_ms + 5000
+
+
+async def admit(domain: str) -> Admission:
+    cfg = load_config()
+    if not cfg.circuit_enabled or not domain:
+        return _PASS
+    try:
+        verdict, failures, until_ms = await acircuit_admit(domain, _probe_ttl_ms(cfg))
+    except Exception:
+        return _PASS  # logged in redis_io
+    if verdict == "closed":
+        return Admission(True, clean=failures == 0)
+    if verdict == "probe":
+        logger.info("scraper.circuit.half_open", domain=domain)
+        CIRCUIT_TRANSITIONS.inc(state="half_open")
+        return Admission(True, clean=False)
+    return Admission(False, retry_at_ms=until_ms)
+
+
+async def report(domain: str, ok: bool, admission: Admission = _PASS) -> None:
+    """Record whether the domain answered. Never raises."""
+    cfg = load_config()
+    if not cfg.circuit_enabled or not domain or (ok and admission.clean):
+        return
+    try:
+        moved = await acircuit_report(domain, ok, cfg.circuit_failure_threshold, int(cfg.circuit_open_s * 1000),
+                                      int(cfg.circuit_max_open_s * 1000), cfg.circuit_window_s)
+    except Exception:
+        return  # logged in redis_io
+    if moved:
+        (logger.warn if moved == "open" else logger.info)(f"scraper.circuit.{moved}", domain=domain)
+        CIRCUIT_TRANSITIONS.inc(state=moved)
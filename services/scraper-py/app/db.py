@@ -1,9 +1,13 @@
+import asyncio
+import time
 from contextlib import contextmanager
-from typing import Iterable, Optional
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from psycopg_pool import ConnectionPool
 
 from .config import load_config
+from .logging import logger
 
 
 _pool: ConnectionPool | None = None
@@ -59,34 +63,256 @@ def transaction():
             raise
 
 
-def upsert_article_tx(conn, language: str, html: Optional[str], text: str, word_count: int, content_hash: str) -> str:
+def link_story_tx(conn, story_id: str, article_id: str, domain: Optional[str], author: Optional[str]) -> None:
     with conn.cursor() as cur:
         cur.execute(
             (
-                "INSERT INTO article(language, html, text, word_count, content_hash) "
-                "VALUES (%s, %s, %s, %s, %s) "
-                "ON CONFLICT (content_hash) DO NOTHING "
-                "RETURNING id"
+                "UPDATE story SET article_id = %s, domain = COALESCE(domain, %s), author = COALESCE(author, %s) "
+                "WHERE id = %s"
             ),
-            (language, html, text, word_count, content_hash),
+            (article_id, domain, author, story_id),
         )
+
+
+def article_owner_tx(conn, article_id: str) -> Optional[str]:
+    """Id of the story linked to the article (story_article_unique allows one), if any."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT id FROM story WHERE article_id = %s", (article_id,))
         row = cur.fetchone()
-        if row and row[0]:
-            return row[0]
-        cur.execute("SELECT id FROM article WHERE content_hash = %s", (content_hash,))
-        row = cur.fetchone()
-        if not row:
-            raise RuntimeError("article_upsert_failed")
-        return row[0]
+        return str(row[0]) if row else None
 
 
-def link_story_tx(conn, story_id: str, article_id: str, domain: Optional[str], author: Optional[str]) -> None:
+def record_duplicate_tx(conn, story_id: str, article_id: str, via: str, similarity: Optional[float] = None,
+                        domain: Optional[str] = None, author: Optional[str] = None) -> None:
+    """Note that the story's content is (nearly) another story's article (story_duplicate, 005)."""
     with conn.cursor() as cur:
         cur.execute(
             (
-                "UPDATE story SET article_id = %s, domain = COALESCE(domain, %s), author = COALESCE(author, %s) "
-                "WHERE id = %s"
+                "INSERT INTO story_duplicate(story_id, article_id, via, similarity) VALUES (%s, %s, %s, %s) "
+                "ON CONFLICT (story_id) DO UPDATE SET article_id = EXCLUDED.article_id, via = EXCLUDED.via, "
+                "similarity = EXCLUDED.similarity"
             ),
-            (article_id, domain, author, story_id),
+            (story_id, article_id, via, similarity),
         )
+        if domain or author:
+            cur.execute(
+                "UPDATE story SET domain = COALESCE(domain, %s), author = COALESCE(author, %s) WHERE id = %s",
+                (domain, author, story_id),
+            )
+
+
+def get_article_tx(conn, article_id: str) -> Optional[Tuple[str, str]]:
+    """(language, text) of an existing article, or None if it no longer exists."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT language, text FROM article WHERE id = %s", (article_id,))
+        row = cur.fetchone()
+        if not row:
+            return None
+        return row[0], row[1]
+
+
+# ---- group-commit article writer ---------------------------------------------------
+
+@dataclass
+class ArticleRow:
+    language: str
+    text: str
+    word_count: int
+    content_hash: str
+    story_id: str
+    domain: Optional[str]
+    author: Optional[str]
+
+
+def write_articles_tx(conn, rows: List[ArticleRow]) -> Dict[str, str]:
+    """Upsert a batch of articles and attach their stories; returns content_hash -> article_id.
+
+    Six statements whatever the batch size, plus one per repost: look up existing
+    hashes, insert only the new ones (so the tsv trigger never fires for
+    duplicates), re-read any that lost an insert race, lock the batch's articles
+    and read who owns them, then link with one UPDATE ... FROM VALUES. story_article_unique
+    allows one story per article, so only a story whose article is unowned (or
+    already its own) is linked; the first such row of a hash claims it, and every
+    other story is recorded as a repost in story_duplicate, as
+    main._link_existing_article does.
+    """
+    by_hash: Dict[str, ArticleRow] = {}
+    for r in rows:
+        by_hash.setdefault(r.content_hash, r)
+    hashes = list(by_hash)
+    ids: Dict[str, str] = {}
+    with conn.cursor() as cur:
+        cur.execute("SELECT content_hash, id FROM article WHERE content_hash = ANY(%s)", (hashes,))
+        ids.update({h: i for h, i in cur.fetchall()})
+
+        new = [by_hash[h] for h in hashes if h not in ids]
+        if new:
+            values = ", ".join(["(%s, NULL, %s, %s, %s)"] * len(new))
+            params: List[object] = []
+            for r in new:
+                params += [r.language, r.text, r.word_count, r.content_hash]
+            cur.execute(
+                (
+                    "INSERT INTO article(language, html, text, word_count, content_hash) "
+                    f"VALUES {values} "
+                    "ON CONFLICT (content_hash) DO NOTHING "
+                    "RETURNING content_hash, id"
+                ),
+                params,
+            )
+            ids.update({h: i for h, i in cur.fetchall()})
 
+        missing = [h for h in hashes if h not in ids]
+        if missing:
+            cur.execute("SELECT content_hash, id FROM article WHERE content_hash = ANY(%s)", (missing,))
+            ids.update({h: i for h, i in cur.fetchall()})
+            if len(ids) < len(hashes):
+                raise RuntimeError("article_upsert_failed")
+
+        # the row locks serialize concurrent batches claiming the same article
+        article_ids = list(ids.values())
+        cur.execute("SELECT id FROM article WHERE id = ANY(%s) ORDER BY id FOR UPDATE", (article_ids,))
+        cur.execute("SELECT article_id, id FROM story WHERE article_id = ANY(%s)", (article_ids,))
+        owners = {str(a): str(sid) for a, sid in cur.fetchall()}
+
+        links: List[ArticleRow] = []
+        reposts: List[ArticleRow] = []
+        for r in rows:
+            article_id = str(ids[r.content_hash])
+            owner = owners.setdefault(article_id, r.story_id)
+            (links if owner == r.story_id else reposts).append(r)
+
+        if links:
+            values = ", ".join(["(%s::uuid, %s::uuid, %s, %s)"] * len(links))
+            params = []
+            for r in links:
+                params += [r.story_id, ids[r.content_hash], r.domain, r.author]
+            cur.execute(
+                (
+                    "UPDATE story AS s SET article_id = v.article_id, "
+                    "domain = COALESCE(s.domain, v.domain), author = COALESCE(s.author, v.author) "
+                    f"FROM (VALUES {values}) AS v(story_id, article_id, domain, author) "
+                    "WHERE s.id = v.story_id"
+                ),
+                params,
+            )
+        for r in reposts:
+            record_duplicate_tx(conn, r.story_id, ids[r.content_hash], "repost", domain=r.domain, author=r.author)
+    return {h: str(i) for h, i in ids.items()}
+
+
+def _write_rows(rows: List[ArticleRow]) -> Dict[str, str]:
+    with transaction() as conn:
+        return write_articles_tx(conn, rows)
+
+
+def _write_row(row: ArticleRow) -> str:
+    with transaction() as conn:
+        return write_articles_tx(conn, [row])[row.content_hash]
+
+
+class ArticleWriter:
+    """Group commit for finished extractions.
+
+    Callers await write(); rows are collected for up to `max_wait_ms` (or until
+    `max_rows` are waiting) and written in one transaction on a worker thread.
+    If a batch fails, its rows are retried one transaction each so a single bad
+    row only fails its own caller.
+    """
+
+    def __init__(self, max_rows: int = 50, max_wait_ms: float = 5.0) -> None:
+        self.max_rows = max(1, int(max_rows))
+        self.max_wait_s = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"batches": 0, "rows": 0, "fallbacks": 0}
+
+    async def write(self, row: ArticleRow) -> str:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((row, fut))
+        return await fut
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self._stats, pending=self._queue.qsize())
+
+    async def close(self) -> None:
+        """Flush whatever is queued, then stop the batching task."""
+        task, self._task = self._task, None
+        if task is None:
+            return
+        if self._queue.qsize():
+            await self._queue.join()
+        task.cancel()
+        try:
+            await task
+        except (asyncio.CancelledError, Exception):
+            pass
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait_s
+            while len(batch) < self.max_rows:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _flush(self, batch: List[Tuple[ArticleRow, asyncio.Future]]) -> None:
+        rows = [row for row, _ in batch]
+        t0 = time.time()
+        try:
+            ids = await asyncio.to_thread(_write_rows, rows)
+        except Exception as e:
+            logger.warn("db.article_writer.batch_failed", rows=len(rows), error=str(e))
+            self._stats["fallbacks"] += 1
+            for row, fut in batch:
+                try:
+                    article_id = await asyncio.to_thread(_write_row, row)
+                except Exception as e1:
+                    if not fut.done():
+                        fut.set_exception(e1)
+                else:
+                    if not fut.done():
+                        fut.set_result(article_id)
+            return
+        self._stats["batches"] += 1
+        self._stats["rows"] += len(rows)
+        logger.debug("db.article_writer.flushed", rows=len(rows), latency_ms=int((time.time() - t0) * 1000))
+        for row, fut in batch:
+            if not fut.done():
+                fut.set_result(ids[row.content_hash])
+
+
+# One writer per event loop (its queue and futures are loop-bound)
+_writer: ArticleWriter | None = None
+_writer_loop: asyncio.AbstractEventLoop | None = None
+
+
+def get_article_writer() -> ArticleWriter:
+    global _writer, _writer_loop
+    loop = asyncio.get_running_loop()
+    if _writer is None or _writer_loop is not loop:
+        cfg = load_config()
+        _writer = ArticleWriter(cfg.db_batch_max_rows, cfg.db_batch_max_wait_ms)
+        _writer_loop = loop
+    return _writer
+
+
+async def close_article_writer() -> None:
+    global _writer, _writer_loop
+    if _writer is None:
+        return
+    writer, _writer, _writer_loop = _writer, None, None
+    await writer.close()
@@ -0,0 +1,214 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from .extractor import Document, extract_document, extract_pdf, SHORT_TEXT_WORDS
+from .normalize import detect_language, content_hash, preload_language_model
+from .near_dup import minhash, encode_signature
+
+
+class ExtractionTimeout(Exception):
+    """Extraction exceeded its per-task budget; the wedged worker was killed."""
+    pass
+
+
+@dataclass
+class Extraction:
+    text: str
+    headings: List[str] = field(default_factory=list)
+    author: Optional[str] = None
+    words: int = 0
+    language: str = "und"
+    content_hash: str = ""
+    is_paywalled: bool = False
+    signature: str = ""  # MinHash for near-duplicate lookup ("" when text is too short)
+    timings: Dict[str, float] = field(default_factory=dict)  # seconds per stage, measured in the worker
+
+
+# ---- worker-side (runs inside the pool processes) ---------------------------------
+
+def _warm_worker() -> None:
+    """Pay import and model-load costs once per worker, not on the first job."""
+    try:
+        import trafilatura  # noqa: F401
+    except Exception:
+        pass
+    try:
+        preload_language_model()
+    except Exception:
+        pass
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def analyze_html(html: str, domain: str, allowed_langs: Optional[str]) -> Extraction:
+    """All CPU-bound per-page work: main text, language and content hash."""
+    t0 = time.perf_counter()
+    doc = extract_document(html)
+    return _analyze(doc, domain, allowed_langs, time.perf_counter() - t0)
+
+
+def analyze_pdf(path: str, domain: str, allowed_langs: Optional[str], max_pages: int) -> Extraction:
+    """Same as analyze_html for a PDF already streamed to `path`."""
+    t0 = time.perf_counter()
+    doc = extract_pdf(path, max_pages)
+    return _analyze(doc, domain, allowed_langs, time.perf_counter() - t0)
+
+
+def _analyze(doc: Document, domain: str, allowed_langs: Optional[str], extract_s: float) -> Extraction:
+    text, headings, author = doc.text, doc.headings, doc.author
+    words = len((text or "").split())
+    is_paywalled = bool(words < SHORT_TEXT_WORDS and doc.paywall_hint)
+    timings = {"extract": extract_s}
+    if not text:
+        return Extraction(text="", headings=headings, author=author, is_paywalled=is_paywalled, timings=timings)
+    t0 = time.perf_counter()
+    lang = detect_language(text, allowed_langs, domain=domain)
+    t1 = time.perf_counter()
+    chash = content_hash(lang, domain, text)
+    t2 = time.perf_counter()
+    sig = minhash(text)
+    t3 = time.perf_counter()
+    timings.update(langid=t1 - t0, hash=t2 - t1, minhash=t3 - t2)
+    return Extraction(
+        text=text,
+        headings=headings,
+        author=author,
+        words=words,
+        language=lang,
+        content_hash=chash,
+        is_paywalled=is_paywalled,
+        signature=encode_signature(sig) if sig is not None else "",
+        timings=timings,
+    )
+
+
+# ---- parent-side -------------------------------------------------------------------
+
+class ExtractPool:
+    """Bounded ProcessPoolExecutor with warm workers, backpressure and timeouts.
+
+    At most `workers + max_pending` tasks are admitted at once; further callers
+    wait. A task that runs past `timeout_s` raises ExtractionTimeout and the pool
+    is restarted, since a worker stuck in C code can't be interrupted otherwise.
+    workers=0 runs tasks inline on a thread (no extra processes).
+    """
+
+    def __init__(self, workers: int, max_pending: int = 32, timeout_s: float = 20.0) -> None:
+        self.workers = max(0, int(workers))
+        self.max_pending = max(0, int(max_pending))
+        self.timeout_s = float(timeout_s)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._warm: Optional[ProcessPoolExecutor] = None  # executor whose workers are up
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.restarts = 0
+
+    def _bind_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._sem = asyncio.Semaphore(max(1, self.workers) + self.max_pending)
+            self._lock = asyncio.Lock()
+            self._loop = loop
+
+    async def _ensure_executor(self) -> ProcessPoolExecutor:
+        """Current executor, spawned and warmed; warm-up never counts against a task's timeout."""
+        self._bind_loop()
+        if self._executor is not None and self._warm is self._executor:
+            return self._executor
+        async with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_warm_worker,
+                )
+            ex = self._executor
+            if self._warm is not ex:
+                loop = asyncio.get_running_loop()
+                await asyncio.gather(*[loop.run_in_executor(ex, _ping) for _ in range(self.workers)])
+                self._warm = ex
+            return ex
+
+    async def start(self) -> None:
+        """Spawn and warm every worker up front."""
+        if self.workers == 0:
+            return
+        await self._ensure_executor()
+
+    async def run(self, fn: Callable[..., Any], *args: Any, timeout_s: Optional[float] = None) -> Any:
+        """Run fn(*args) in a worker; `timeout_s` overrides the pool default for this task."""
+        timeout_s = self.timeout_s if timeout_s is None else float(timeout_s)
+        self._bind_loop()
+        async with self._sem:
+            if self.workers == 0:
+                return await asyncio.wait_for(asyncio.to_thread(fn, *args), timeout=timeout_s)
+            loop = asyncio.get_running_loop()
+            for attempt in range(2):
+                ex = await self._ensure_executor()
+                try:
+                    return await asyncio.wait_for(loop.run_in_executor(ex, fn, *args), timeout=timeout_s)
+                except asyncio.TimeoutError:
+                    self._restart(ex)
+                    raise ExtractionTimeout(f"extraction exceeded {timeout_s}s")
+                except BrokenProcessPool:
+                    # a sibling task's timeout (or a crash) took the pool down; retry once
+                    self._restart(ex)
+                    if attempt:
+                        raise
+
+    async def analyze(self, html: str, domain: str, allowed_langs: Optional[str]) -> Extraction:
+        return await self.run(analyze_html, html, domain, allowed_langs)
+
+    async def analyze_pdf(self, path: str, domain: str, allowed_langs: Optional[str],
+                          max_pages: int, timeout_s: float) -> Extraction:
+        return await self.run(analyze_pdf, path, domain, allowed_langs, max_pages, timeout_s=timeout_s)
+
+    def _restart(self, ex: ProcessPoolExecutor) -> None:
+        if self._executor is not ex:
+            return  # someone else already replaced it
+        self._executor = None
+        self.restarts += 1
+        for proc in list((getattr(ex, "_processes", None) or {}).values()):
+            try:
+                proc.kill()
+            except Exception:
+                pass
+        ex.shutdown(wait=False, cancel_futures=True)
+
+    def close(self) -> None:
+        ex, self._executor, self._warm = self._executor, None, None
+        if ex is not None:
+            ex.shutdown(wait=True, cancel_futures=True)
+
+
+_pool: ExtractPool | None = None
+
+
+def get_extract_pool() -> ExtractPool:
+    global _pool
+    if _pool is None:
+        # imported lazily: spawned workers import this module and never need config
+        from .config import load_config
+        cfg = load_config()
+        _pool = ExtractPool(cfg.extract_workers, cfg.extract_max_pending, cfg.extract_timeout_s)
+    return _pool
+
+
+def close_extract_pool() -> None:
+    global _pool
+    if _pool is None:
+        return
+    pool, _pool = _pool, None
+    try:
+        pool.close()
+    except Exception:
+        pass
@@ -1,12 +1,48 @@
-from typing import List, Optional, Tuple
+import re
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Tuple
 from bs4 import BeautifulSoup, FeatureNotFound
 
+try:
+    import lxml.html
+    from lxml import etree
+    _HAS_LXML = True
+except Exception:
+    _HAS_LXML = False
+
 try:
     import trafilatura
     _HAS_TRAF = True
 except Exception:
     _HAS_TRAF = False
 
+try:
+    from pypdf import PdfReader
+    _HAS_PYPDF = True
+except Exception:
+    _HAS_PYPDF = False
+
+PDF_SUPPORTED = _HAS_PYPDF
+
+
+PAYWALL_MARKERS = ("subscribe", "paywall")
+SHORT_TEXT_WORDS = 100  # below this an article may be a teaser behind a wall
+
+# Elements whose class/id names a paywall or subscription wall
+_PAYWALL_XPATH = (
+    "//*[contains(@class,'paywall') or contains(@id,'paywall')"
+    " or contains(@class,'subscribe') or contains(@id,'subscribe')]"
+)
+_NOT_FREE_RE = re.compile(r'"isAccessibleForFree"\s*:\s*"?false', re.I)
+
+
+@dataclass
+class Document:
+    text: str
+    headings: List[str] = field(default_factory=list)
+    author: Optional[str] = None
+    paywall_hint: bool = False
+
 
 def extract_with_bs4(html: str) -> Tuple[str, List[str], Optional[str]]:
     try:
@@ -31,7 +67,7 @@ def extract_with_bs4(html: str) -> Tuple[str, List[str], Optional[str]]:
     return text, headings[:5], author
 
 
-def extract_content(html: str) -> Tuple[str, List[str], Optional[str]]:
+def _extract_without_lxml(html: str) -> Tuple[str, List[str], Optional[str]]:
     if _HAS_TRAF:
         try:
             extracted = trafilatura.extract(html, include_comments=False, include_tables=False, include_formatting=False)
@@ -43,3 +79,159 @@ def extract_content(html: str) -> Tuple[str, List[str], Optional[str]]:
             pass
     return extract_with_bs4(html)
 
+
+# ---- single-parse (lxml) path -----------------------------------------------------
+
+def _parse(html: str) -> Optional[Any]:
+    try:
+        return lxml.html.document_fromstring(html)
+    except ValueError:
+        # str input carrying an XML encoding declaration: hand lxml bytes instead
+        try:
+            parser = lxml.html.HTMLParser(encoding="utf-8")
+            return lxml.html.document_fromstring(html.encode("utf-8", errors="ignore"), parser=parser)
+        except Exception:
+            return None
+    except Exception:
+        return None
+
+
+def _text_of(el: Any) -> str:
+    # same joining as bs4's get_text(" ", strip=True)
+    return " ".join(s.strip() for s in el.itertext() if s and s.strip())
+
+
+def _headings(tree: Any) -> List[str]:
+    out: List[str] = []
+    for el in tree.iter("h1", "h2", "h3"):
+        txt = _text_of(el)
+        if txt:
+            out.append(txt)
+            if len(out) >= 5:
+                break
+    return out
+
+
+def _author(tree: Any) -> Optional[str]:
+    found = tree.xpath("//*[@name='author']")
+    if found and found[0].get("content"):
+        return found[0].get("content")
+    return None
+
+
+def _paywall_hint(tree: Any) -> bool:
+    if tree.xpath(_PAYWALL_XPATH):
+        return True
+    for script in tree.xpath("//script[@type='application/ld+json']"):
+        if _NOT_FREE_RE.search(script.text or ""):
+            return True
+    return False
+
+
+def _mentions_paywall(tree: Any) -> bool:
+    # visible text only; scripts/styles are skipped rather than stripped
+    for el in tree.iter():
+        hidden = not isinstance(el.tag, str) or el.tag in ("script", "style", "noscript")
+        for chunk in ((el.tail,) if hidden else (el.text, el.tail)):
+            if chunk and any(k in chunk.lower() for k in PAYWALL_MARKERS):
+                return True
+    return False
+
+
+def _fallback_text(tree: Any) -> str:
+    # last use of the tree, so it may be stripped in place
+    etree.strip_elements(tree, "script", "style", "noscript", etree.Comment, with_tail=False)
+    parts = [_text_of(p) for p in tree.iter("p")]
+    text = "\n\n".join([t for t in parts if t])
+    if not text:
+        text = _text_of(tree)
+    return text
+
+
+def extract_document(html: str) -> Document:
+    """Parse once into an lxml tree and derive everything from it.
+
+    Headings, author and paywall signals are read from the tree, and the same tree
+    is handed to trafilatura (which works on its own copy), so the page is never
+    parsed twice. Falls back to BeautifulSoup only when lxml is unavailable.
+    """
+    if not _HAS_LXML:
+        text, headings, author = _extract_without_lxml(html)
+        return Document(text=text, headings=headings, author=author,
+                        paywall_hint=any(k in html.lower() for k in PAYWALL_MARKERS))
+
+    tree = _parse(html)
+    if tree is None:
+        return Document(text="")
+
+    headings = _headings(tree)
+    author = _author(tree)
+
+    text = ""
+    if _HAS_TRAF:
+        try:
+            extracted = trafilatura.extract(tree, include_comments=False, include_tables=False, include_formatting=False)
+            if extracted and len(extracted.strip()) > 0:
+                text = extracted.strip()
+        except Exception:
+            pass
+
+    # paywall signals only matter for short extractions; read them before any stripping
+    paywall_hint = False
+    if len(text.split()) < SHORT_TEXT_WORDS:
+        paywall_hint = _paywall_hint(tree) or _mentions_paywall(tree)
+    if not text:
+        text = _fallback_text(tree)
+    return Document(text=text, headings=headings, author=author, paywall_hint=paywall_hint)
+
+
+def extract_content(html: str) -> Tuple[str, List[str], Optional[str]]:
+    doc = extract_document(html)
+    return doc.text, doc.headings, doc.author
+
+
+# ---- PDF ---------------------------------------------------------------------------
+
+PDF_MAX_CHARS = 500_000  # plenty for summarizing; keeps a 300-page paper's text bounded
+
+
+def extract_pdf(path: str, max_pages: int) -> Document:
+    """Text of the first `max_pages` pages of the PDF at `path`. Pages become paragraphs ("\n\n").
+
+    The reader gets an open file rather than the path: given a path, pypdf reads
+    the whole file into memory up front. From a file it seeks to the objects each
+    page needs, and keeps them cached, so memory grows with the pages actually
+    read (at most `max_pages`, stopping early at PDF_MAX_CHARS). The file itself
+    never exceeds PDF_MAX_BYTES (the download is capped while streaming).
+    """
+    with open(path, "rb") as fh:
+        return _extract_pdf_stream(fh, max_pages)
+
+
+def _extract_pdf_stream(fh, max_pages: int) -> Document:
+    reader = PdfReader(fh)
+    if reader.is_encrypted:
+        try:
+            reader.decrypt("")
+        except Exception:
+            return Document(text="")
+    author = None
+    try:
+        meta = reader.metadata
+        if meta and meta.author:
+            author = str(meta.author).strip() or None
+    except Exception:
+        pass
+    parts: List[str] = []
+    total = 0
+    for i, page in enumerate(reader.pages):
+        if i >= max_pages or total >= PDF_MAX_CHARS:
+            break
+        try:
+            txt = (page.extract_text() or "").strip()
+        except Exception:
+            continue  # one broken page shouldn't lose the rest
+        if txt:
+            parts.append(txt)
+            total += len(txt)
+    return Document(text="\n\n".join(parts)[:PDF_MAX_CHARS], author=author)
@@ -0,0 +1,258 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from .config import load_config
+from .logging import logger
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    key: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    final_url: str
+    content_type: str
+    size: int
+    extraction: Optional[Dict[str, Any]]
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+  url            TEXT PRIMARY KEY,
+  key            TEXT NOT NULL,
+  etag           TEXT,
+  last_modified  TEXT,
+  final_url      TEXT NOT NULL,
+  content_type   TEXT NOT NULL,
+  size           INTEGER NOT NULL,
+  stored_at      REAL NOT NULL,
+  last_access    REAL NOT NULL,
+  extraction     TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_last_access_idx ON entries(last_access);
+"""
+
+
+class FetchCache:
+    """Conditional-GET cache keyed by canonical URL.
+
+    A SQLite index holds validators (ETag / Last-Modified) and metadata; bodies
+    live next to it as zlib-compressed files. Only responses that carry a
+    validator are stored, since nothing else can be revalidated. The finished
+    extraction can be attached to an entry so a 304 skips re-extraction too.
+    Total body size is kept under `max_bytes` by evicting least-recently-used
+    entries. Methods are blocking; call them from a thread in async code.
+
+    The cache is only an optimisation, so the methods the fetch path calls never
+    raise: a locked database or a full disk is logged (fetch_cache.error) and the
+    job carries on as if the URL were not cached.
+    """
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        self.directory = directory
+        self.max_bytes = max(1, int(max_bytes))
+        os.makedirs(os.path.join(directory, "bodies"), exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(directory, "index.sqlite3"), timeout=5.0,
+                                   check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    # ---- lookup --------------------------------------------------------------------
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        try:
+            return self._lookup(url)
+        except Exception as e:
+            logger.warn("fetch_cache.error", op="lookup", error=str(e))
+            return None
+
+    def _lookup(self, url: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, key, etag, last_modified, final_url, content_type, size, extraction "
+                "FROM entries WHERE url = ?", (url,),
+            ).fetchone()
+        if row is None:
+            return None
+        if not os.path.exists(self._body_path(row[1])):
+            self.delete(url)  # body evicted by a sibling process
+            return None
+        extraction = None
+        if row[7]:
+            try:
+                extraction = json.loads(row[7])
+            except Exception:
+                extraction = None
+        return CacheEntry(*row[:7], extraction=extraction)
+
+    @staticmethod
+    def validators(entry: CacheEntry) -> Dict[str, str]:
+        headers: Dict[str, str] = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def load_body(self, entry: CacheEntry) -> Optional[bytes]:
+        try:
+            with open(self._body_path(entry.key), "rb") as f:
+                return zlib.decompress(f.read())
+        except Exception:
+            self.delete(entry.url)
+            return None
+
+    # ---- outcomes ------------------------------------------------------------------
+
+    def record_hit(self, url: str) -> None:
+        """A 304 came back: count it and refresh the entry's LRU position."""
+        with self._lock:
+            self._stats["hits"] += 1
+            try:
+                self._db.execute("UPDATE entries SET last_access = ? WHERE url = ?", (time.time(), url))
+            except Exception as e:
+                logger.warn("fetch_cache.error", op="record_hit", error=str(e))
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self._stats["misses"] += 1
+
+    def store(self, url: str, final_url: str, content_type: str, headers: Dict[str, str], body: bytes) -> bool:
+        try:
+            return self._store(url, final_url, content_type, headers, body)
+        except Exception as e:
+            logger.warn("fetch_cache.error", op="store", error=str(e))
+            return False
+
+    def _store(self, url: str, final_url: str, content_type: str, headers: Dict[str, str], body: bytes) -> bool:
+        lower = {k.lower(): v for k, v in (headers or {}).items()}
+        etag, last_modified = lower.get("etag"), lower.get("last-modified")
+        if not (etag or last_modified) or not body:
+            return False
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        path = self._body_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(zlib.compress(body, 6))
+            os.replace(tmp, path)
+        except OSError:
+            try:
+                os.remove(tmp)  # e.g. a half-written file on a full disk
+            except OSError:
+                pass
+            raise
+        size = os.path.getsize(path)
+        now = time.time()
+        with self._lock:
+            # a fresh body invalidates any extraction attached to the old one
+            self._db.execute(
+                "INSERT INTO entries(url, key, etag, last_modified, final_url, content_type, size, stored_at, last_access, extraction) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, NULL) "
+                "ON CONFLICT(url) DO UPDATE SET etag=excluded.etag, last_modified=excluded.last_modified, "
+                "final_url=excluded.final_url, content_type=excluded.content_type, size=excluded.size, "
+                "stored_at=excluded.stored_at, last_access=excluded.last_access, extraction=NULL",
+                (url, key, etag, last_modified, final_url, content_type, size, now, now),
+            )
+            self._stats["stores"] += 1
+        self._evict()
+        return True
+
+    def store_extraction(self, url: str, extraction: Dict[str, Any]) -> None:
+        try:
+            with self._lock:
+                self._db.execute("UPDATE entries SET extraction = ? WHERE url = ?",
+                                 (json.dumps(extraction, ensure_ascii=False), url))
+        except Exception as e:
+            logger.warn("fetch_cache.error", op="store_extraction", error=str(e))
+
+    def delete(self, url: str) -> None:
+        try:
+            with self._lock:
+                row = self._db.execute("SELECT key FROM entries WHERE url = ?", (url,)).fetchone()
+                self._db.execute("DELETE FROM entries WHERE url = ?", (url,))
+        except Exception as e:
+            logger.warn("fetch_cache.error", op="delete", error=str(e))
+            return
+        if row:
+            self._unlink(row[0])
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            total, count = self._db.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM entries").fetchone()
+            return dict(self._stats, bytes=int(total), entries=int(count))
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._db.close()
+            except Exception:
+                pass
+
+    # ---- internals -----------------------------------------------------------------
+
+    def _evict(self) -> None:
+        with self._lock:
+            (total,) = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+            if total <= self.max_bytes:
+                return
+            target = int(self.max_bytes * 0.9)
+            victims = []
+            for url, key, size in self._db.execute("SELECT url, key, size FROM entries ORDER BY last_access ASC"):
+                if total <= target:
+                    break
+                victims.append((url, key))
+                total -= size
+            self._db.executemany("DELETE FROM entries WHERE url = ?", [(u,) for u, _ in victims])
+            self._stats["evictions"] += len(victims)
+        for _, key in victims:
+            self._unlink(key)
+        logger.debug("fetch_cache.evicted", count=len(victims))
+
+    def _body_path(self, key: str) -> str:
+        return os.path.join(self.directory, "bodies", key[:2], f"{key}.z")
+
+    def _unlink(self, key: str) -> None:
+        try:
+            os.remove(self._body_path(key))
+        except OSError:
+            pass
+
+
+_cache: FetchCache | None = None
+_cache_failed = False
+
+
+def get_fetch_cache() -> Optional[FetchCache]:
+    """Process-wide cache, or None when FETCH_CACHE_DIR is empty or unusable."""
+    global _cache, _cache_failed
+    if _cache is None and not _cache_failed:
+        cfg = load_config()
+        if not cfg.fetch_cache_dir:
+            _cache_failed = True
+            return None
+        try:
+            _cache = FetchCache(cfg.fetch_cache_dir, cfg.fetch_cache_max_mb * 1024 * 1024)
+            logger.info("fetch_cache.opened", dir=cfg.fetch_cache_dir, max_mb=cfg.fetch_cache_max_mb)
+        except Exception as e:
+            _cache_failed = True
+            logger.warn("fetch_cache.unavailable", dir=cfg.fetch_cache_dir, error=str(e))
+    return _cache
+
+
+def close_fetch_cache() -> None:
+    global _cache
+    if _cache is not None:
+        _cache.close()
+        _cache = None
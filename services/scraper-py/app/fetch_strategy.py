@@ -0,0 +1,96 @@
+"""Per-domain fetch strategy learned from past outcomes.
+
+Every job reports how its domain behaved (plain fetch ok / empty extraction /
+bot-blocked / failed, headless ok / failed) into a decaying counter hash in
+Redis, shared by all workers. choose() turns those counters into one of:
+
+- DEFAULT: plain fetch, headless fallback on a retryable error or empty text
+- HEADLESS_FIRST: the domain walls bots or renders with JS and headless works
+  there, so skip the plain fetch that would only burn FETCH_TIMEOUT_MS
+- HTTP_ONLY: plain fetch reliably yields text; no headless fallback
+
+Counters halve every FETCH_STRATEGY_HALF_LIFE_S, so a decision is only held
+while fresh evidence keeps it up: a HEADLESS_FIRST domain stops reporting
+plain-fetch outcomes, falls below FETCH_STRATEGY_MIN_SAMPLES and gets probed
+with a plain fetch again.
+"""
+import time
+from typing import Dict, Tuple
+
+from .config import load_config
+from .logging import logger
+from .redis_io import aget_domain_stats, arecord_domain_outcomes
+
+DEFAULT = "default"
+HEADLESS_FIRST = "headless_first"
+HTTP_ONLY = "http_only"
+
+# statuses that mean "not for bots" rather than "down"; a browser often gets through
+BLOCKED_STATUSES = (401, 403, 406, 451)
+
+_HEADLESS_FIRST_RATIO = 0.8  # share of plain fetches that were blocked or empty
+_HEADLESS_OK_RATIO = 0.5  # share of headless attempts that produced text
+_HTTP_ONLY_RATIO = 0.95  # share of plain fetches that produced text
+
+# decisions are cached per process briefly so a burst from one domain costs one read
+_DECISION_TTL_S = 60.0
+_MAX_TRACKED_HOSTS = 2048
+_decisions: Dict[str, Tuple[float, str]] = {}
+
+
+def decide(stats: Dict[str, float], min_samples: float) -> str:
+    ok, empty = stats.get("ok", 0.0), stats.get("empty", 0.0)
+    blocked, error = stats.get("blocked", 0.0), stats.get("error", 0.0)
+    headless_ok, headless_fail = stats.get("headless_ok", 0.0), stats.get("headless_fail", 0.0)
+    plain = ok + empty + blocked + error
+    headless = headless_ok + headless_fail
+    if plain < min_samples:
+        return DEFAULT
+    if ((blocked + empty) / plain >= _HEADLESS_FIRST_RATIO
+            and headless >= min_samples and headless_ok / headless >= _HEADLESS_OK_RATIO):
+        return HEADLESS_FIRST
+    if ok / plain >= _HTTP_ONLY_RATIO:
+        return HTTP_ONLY
+    return DEFAULT
+
+
+def _enabled(cfg) -> bool:
+    # with headless off there is nothing to choose between
+    return cfg.fetch_strategy_enabled and cfg.headless_enabled
+
+
+async def choose(domain: str) -> str:
+    """Strategy for `domain`; DEFAULT when disabled, unknown or Redis is unavailable."""
+    cfg = load_config()
+    if not _enabled(cfg) or not domain:
+        return DEFAULT
+    now = time.monotonic()
+    hit = _decisions.get(domain)
+    if hit is not None and hit[0] > now:
+        return hit[1]
+    try:
+        stats = await aget_domain_stats(domain, cfg.fetch_strategy_half_life_s)
+    except Exception:
+        return DEFAULT  # logged in redis_io; don't cache, try again next job
+    strategy = decide(stats, cfg.fetch_strategy_min_samples)
+    if len(_decisions) >= _MAX_TRACKED_HOSTS:
+        _decisions.pop(next(iter(_decisions)))
+    _decisions[domain] = (now + _DECISION_TTL_S, strategy)
+    if strategy != DEFAULT:
+        logger.debug("scraper.strategy.decided", domain=domain, strategy=strategy,
+                     stats={k: round(v, 2) for k, v in stats.items()})
+    return strategy
+
+
+async def record(domain: str, *outcomes: str) -> None:
+    """Add outcomes (ok, empty, blocked, error, headless_ok, headless_fail) for `domain`.
+
+    Never raises: a lost sample only delays a decision.
+    """
+    cfg = load_config()
+    if not _enabled(cfg) or not domain or not outcomes:
+        return
+    try:
+        await arecord_domain_outcomes(domain, list(outcomes), cfg.fetch_strategy_half_life_s)
+    except Exception:
+        pass  # logged in redis_io
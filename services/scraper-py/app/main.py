@@ -1,19 +1,42 @@
+import asyncio
 import json
 import random
 import time
-from typing import Any, Dict, Optional
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
 import os
-import inspect
 
-from .config import load_config
+from .config import load_config, install_reload_handlers
 from .logging import logger
-from .redis_io import blpop, rpush, lpush, is_idempotent_done,set_idempotent_done
-from .normalize import canonicalize_url, detect_language, content_hash
-from .fetcher import fetch_url, headless_fetch, RetryableFetch, NonRetryableFetch
-from .extractor import extract_content
-from .db import transaction, upsert_article_tx, link_story_tx, close_pool
+from .redis_io import (
+    blpop, arpush, ais_idempotent_done, aclose, abatch_pop, aenqueue_and_mark_done,
+    schedule_delayed, promote_due, aschedule_delayed, apromote_due, delayed_key,
+    alease_pop, aack, arequeue_leased, arenew_lease, areap_expired,
+    aget_canonical_article, aset_canonical_article, adelete_canonical_article, alsh_candidates, alsh_add,
+)
+from .normalize import PSL_SNAPSHOT_VERSION, canonicalize_url
+from .near_dup import band_keys, decode_signature, similarity
+from .browser_pool import close_browser_pool
+from .fetcher import (
+    fetch_url, headless_fetch, close_http_client, is_html_response,
+    NotModified, RetryableFetch, NonRetryableFetch, UnsupportedContent, BodyTooLarge,
+)
+from .extract_pool import get_extract_pool, close_extract_pool, Extraction, ExtractionTimeout
+from .fetch_cache import get_fetch_cache, close_fetch_cache
+from .db import (
+    transaction, link_story_tx, get_article_tx, article_owner_tx, record_duplicate_tx, close_pool,
+    ArticleRow, get_article_writer, close_article_writer,
+)
 from .payloads import build_summarizer_payload
 from .charset_util import decode_body
+from .scheduler import get_scheduler
+from .stages import stage, record_stage
+from . import circuit, fetch_strategy
+from .fetch_strategy import BLOCKED_STATUSES, HEADLESS_FIRST, HTTP_ONLY
+from .metrics import (
+    FETCH_BYTES, FETCH_STRATEGY, HEADLESS, JOB_OUTCOMES, JOBS_COMPLETED, JOBS_IN_FLIGHT, start_metrics_server,
+)
 
 
 class NonRetryable(Exception):
@@ -26,20 +49,6 @@ def _now_ms() -> int:
     return int(time.time() * 1000)
 
 
-def _maybe_call_async(fn, *args, **kwargs):
-    """
-    Allows calling possibly-async functions (e.g., fetch_url, headless_fetch)
-    from this synchronous worker. If fn(*args, **kwargs) returns an awaitable,
-    we run it to completion; otherwise we return the value directly.
-    """
-    result = fn(*args, **kwargs)
-    if inspect.isawaitable(result):
-        # minimal, local event loop just for this call
-        import asyncio
-        return asyncio.run(result)
-    return result
-
-
 def _decode_redis_item(item: Any) -> Optional[Dict[str, Any]]:
     """
     Accepts:
@@ -82,30 +91,246 @@ def _pop_job_from_queue(queue: str, timeout_s: int) -> Optional[Dict[str, Any]]:
     return job
 
 
+async def _apop_jobs(queues: List[str], count: int, timeout_s: int) -> List[Dict[str, Any]]:
+    """Batch pop + decode across queues (priority order) in one round trip."""
+    jobs = []
+    for queue, item in await abatch_pop(queues, count, timeout_s):
+        try:
+            job = _decode_redis_item(item)
+        except NonRetryable as e:
+            logger.error("scraper.queue.bad_item", queue=queue, error=str(e))
+            continue
+        if job:
+            jobs.append(job)
+    return jobs
+
+
+def _record_worker_stages(ex: Extraction) -> None:
+    # extract / langid / hash / minhash were timed inside the pool worker
+    for name, seconds in (ex.timings or {}).items():
+        record_stage(name, seconds)
+
+
+def _body_size(body: Any) -> int:
+    if isinstance(body, Path):
+        return body.stat().st_size
+    return len(body) if body else 0
+
+
+def _link_existing_article(article_id: str, story_id: str, domain: str, author: Optional[str],
+                           via: str = "repost", score: Optional[float] = None) -> Optional[Tuple[str, str]]:
+    """Attach the story to an already-stored article; returns its (language, text).
+
+    story_article_unique allows one story per article, so a repost is only linked
+    when no other story holds the article; otherwise, and always for a near_dup
+    (its text only resembles the article's), the relation goes into
+    story_duplicate, which story_list falls back to. None (and nothing written)
+    when the article has since been deleted.
+    """
+    with transaction() as conn:
+        row = get_article_tx(conn, article_id)
+        if row is None:
+            return None
+        owner = article_owner_tx(conn, article_id) if via == "repost" else None
+        if via == "repost" and (owner is None or owner == story_id):
+            link_story_tx(conn, story_id, article_id, domain=domain, author=author)
+        else:
+            record_duplicate_tx(conn, story_id, article_id, via,
+                                similarity=None if score is None else round(score, 4),
+                                domain=domain, author=author)
+    return row
+
+
+async def _link_to_existing(job: Dict[str, Any], article_id: str, domain: str,
+                            meta: Dict[str, Any], via: str, score: Optional[float] = None) -> Optional[bool]:
+    """Finish a job against an article that is already stored (a repost or near-duplicate).
+
+    Attaches the story, then enqueues the summarizer with the existing article_id
+    (the summarizer dedups per article, so no second summary is paid for). Returns
+    None when that article no longer exists, otherwise the job outcome.
+    """
+    cfg = load_config()
+    trace_id = job.get("trace_id")
+    story = job.get("story") or {}
+    story_id = story.get("id")
+    try:
+        row = await asyncio.to_thread(_link_existing_article, article_id, story_id, domain, meta.get("author"),
+                                      via, score)
+    except Exception as e:
+        logger.error("scraper.database.transaction.error", trace_id=trace_id, story_id=story_id, error=str(e))
+        return await _handle_retry(job, reason="DB_ERROR", err=str(e))
+    if row is None:
+        logger.warn(f"scraper.{via}.stale", trace_id=trace_id, story_id=story_id, article_id=article_id)
+        return None
+    lang, text = row
+
+    payload = build_summarizer_payload(trace_id, story, article_id, lang, text, meta.get("headings") or [],
+                                       bool(meta.get("is_pdf")), bool(meta.get("is_paywalled")), domain,
+                                       meta.get("final_url") or story.get("url"))
+    try:
+        await aenqueue_and_mark_done(cfg.summarizer_queue, payload, story_id)
+    except Exception as e:
+        logger.error("scraper.summarizer.enqueue.error", trace_id=trace_id, story_id=story_id,
+                     article_id=article_id, error=str(e))
+        return await _handle_retry(job, reason="REDIS_OUT", err=str(e))
+
+    logger.info("scraper.job.completed", trace_id=trace_id, story_id=story_id, article_id=article_id, via=via)
+    JOBS_COMPLETED.inc(via=via)
+    return True
+
+
+async def _process_repost(job: Dict[str, Any], canon_url: str, domain: str) -> Optional[bool]:
+    """Short-circuit a story whose canonical URL already produced an article.
+
+    Returns None when there is no usable index entry (caller runs the full path),
+    otherwise the job outcome.
+    """
+    try:
+        hit = await aget_canonical_article(canon_url)
+    except Exception:
+        return None  # index is an optimisation; fall back to fetching
+    if not hit or not hit.get("article_id"):
+        return None
+
+    logger.info("scraper.repost.hit", trace_id=job.get("trace_id"), story_id=(job.get("story") or {}).get("id"),
+                canonical_url=canon_url, article_id=hit["article_id"])
+    outcome = await _link_to_existing(job, hit["article_id"], domain, hit, via="repost")
+    if outcome is None:
+        await adelete_canonical_article(canon_url)
+    return outcome
+
+
+async def _find_near_duplicate(signature: str, threshold: float) -> Optional[Tuple[str, float]]:
+    """Best already-indexed article whose MinHash similarity reaches `threshold`."""
+    sig = decode_signature(signature)
+    if sig is None:
+        return None
+    best: Optional[Tuple[str, float]] = None
+    for article_id, cand in (await alsh_candidates(band_keys(sig))).items():
+        other = decode_signature(cand)
+        if other is None:
+            continue
+        score = similarity(sig, other)
+        if score >= threshold and (best is None or score > best[1]):
+            best = (article_id, score)
+    return best
+
+
+# ---- leases (LEASE_QUEUES) ---------------------------------------------------------
+
+def _queues(cfg) -> List[str]:
+    return [cfg.input_queue, cfg.retry_queue]
+
+
+async def _lease_heartbeat(cfg) -> None:
+    """Keep this worker's lease alive and requeue the jobs of workers whose lease lapsed."""
+    while True:
+        cfg = load_config()
+        try:
+            await arenew_lease(_queues(cfg), cfg.lease_ttl_s)
+            await areap_expired(_queues(cfg))
+        except Exception as e:
+            logger.error("scraper.lease.heartbeat_error", error=str(e))
+        await asyncio.sleep(cfg.lease_ttl_s / 3)
+
+
 # ---- core worker -------------------------------------------------------------------
 
 def process_one() -> bool:
     cfg = load_config()
     logger.info("scraper.process_one.start", queue=cfg.input_queue)
+    if cfg.lease_queues:
+        return asyncio.run(_process_leased_once(cfg))
 
-    # 1) Try input queue, then retry queue (respecting visibility)
+    # 1) Try input queue, then retry queue (only due retries are ever on the list)
     job = _pop_job_from_queue(cfg.input_queue, 5)
     if not job:
         logger.debug("scraper.no_job_input_queue", queue=cfg.input_queue)
-        job = _pop_job_from_queue(cfg.retry_queue, 1)
-        if not job:
-            logger.debug("scraper.no_job_retry_queue", queue=cfg.retry_queue)
-            return False
-
-        visible_at = job.get("visible_at")
-        if visible_at and visible_at > _now_ms():
-            logger.debug(
-                "scraper.job_not_visible_yet",
-                visible_at=visible_at,
-                current_time=_now_ms(),
-            )
-            rpush(cfg.retry_queue, job)
-            return False
+        promote_due(cfg.retry_queue)
+        while True:
+            job = _pop_job_from_queue(cfg.retry_queue, 1)
+            if not job:
+                logger.debug("scraper.no_job_retry_queue", queue=cfg.retry_queue)
+                return False
+            visible_at = job.get("visible_at")
+            if not (visible_at and visible_at > _now_ms()):
+                break
+            # pushed straight onto the list by an older worker: park it until due
+            logger.debug("scraper.job_not_visible_yet", visible_at=visible_at, current_time=_now_ms())
+            schedule_delayed(cfg.retry_queue, job, visible_at)
+
+    return asyncio.run(_process_job_once(job))
+
+
+async def _process_job_once(job: Dict[str, Any]) -> bool:
+    try:
+        with JOBS_IN_FLIGHT.track():
+            return await process_job(job)
+    finally:
+        await _close_loop_clients()
+
+
+async def _close_loop_clients() -> None:
+    # asyncio.run() gives every call a fresh loop; drop the loop-bound clients with it
+    await close_article_writer()
+    await close_http_client()
+    await close_browser_pool()
+    await aclose()
+
+
+async def _process_leased_once(cfg) -> bool:
+    """process_one() under LEASE_QUEUES: the job stays in this consumer's processing
+    list until it reaches a terminal state, so a crash mid-job cannot lose it."""
+    heartbeat = asyncio.create_task(_lease_heartbeat(cfg))
+    try:
+        await apromote_due(cfg.retry_queue)
+        while True:
+            popped = await alease_pop(_queues(cfg), 1, 5, cfg.lease_ttl_s)
+            if not popped:
+                logger.debug("scraper.no_job_available", queues=_queues(cfg))
+                return False
+            queue, raw, item = popped[0]
+            try:
+                job = _decode_redis_item(item)
+            except NonRetryable as e:
+                logger.error("scraper.queue.bad_item", queue=queue, error=str(e))
+                job = None
+            visible_at = (job or {}).get("visible_at")
+            if visible_at and visible_at > _now_ms():
+                # pushed straight onto the list by an older worker: park it until due
+                logger.debug("scraper.job_not_visible_yet", visible_at=visible_at, current_time=_now_ms())
+                await aschedule_delayed(cfg.retry_queue, job, visible_at)
+                job = None
+            if job:
+                break
+            await aack(queue, raw)
+
+        try:
+            with JOBS_IN_FLIGHT.track():
+                ok = await process_job(job)
+        except NonRetryable:
+            await aack(queue, raw)
+            raise
+        except Exception:
+            await arequeue_leased(queue, raw)
+            raise
+        await aack(queue, raw)
+        return ok
+    finally:
+        heartbeat.cancel()
+        await asyncio.gather(heartbeat, return_exceptions=True)
+        await _close_loop_clients()
+
+
+async def process_job(job: Dict[str, Any], idempotency_checked: bool = False) -> bool:
+    """Run one decoded job through fetch -> extract -> persist -> enqueue.
+
+    Shared by the one-shot process_one() and the concurrent worker (app.worker);
+    blocking DB work is pushed to a thread so concurrent fetches keep overlapping.
+    `idempotency_checked` skips the done-marker lookup when the caller already
+    did it for a whole batch.
+    """
+    cfg = load_config()
 
     # 2) Basic validation / idempotency
     trace_id = job.get("trace_id")
@@ -118,7 +343,8 @@ def process_one() -> bool:
     if not story_id:
         logger.error("scraper.job.bad_payload", trace_id=trace_id, job=job)
         raise NonRetryable("bad_payload")
-    if is_idempotent_done(story_id) and not (os.environ.get("FORCE", "false").lower() in ("1", "true", "yes")):
+    force = os.environ.get("FORCE", "false").lower() in ("1", "true", "yes")
+    if not idempotency_checked and not force and await ais_idempotent_done(story_id):
         logger.info("scraper.job.skip_idempotent", trace_id=trace_id, story_id=story_id)
         return True
 
@@ -132,125 +358,289 @@ def process_one() -> bool:
     logger.info("scraper.url.normalized", trace_id=trace_id, story_id=story_id,
                 original_url=url, canonical_url=canon_url, domain=domain)
 
-    # 4) Fetch
-    logger.info("scraper.fetch.start", trace_id=trace_id, story_id=story_id, url=canon_url)
+    # 3b) Repost of a recently scraped URL: link the existing article, no fetch
+    if cfg.canon_index_ttl_s > 0 and not force:
+        outcome = await _process_repost(job, canon_url, domain)
+        if outcome is not None:
+            return outcome
+
+    # 3c) Domain's circuit is open: park the job until it may be tried again
+    admission = await circuit.admit(domain)
+    if not admission.allowed:
+        return await _park_for_circuit(job, domain, admission.retry_at_ms)
+
+    # 4) Fetch (conditional when the fetch cache holds validators for this URL). The
+    # domain's strategy may go headless first or rule the headless fallback out; a
+    # retry always gets the fallback back.
+    strategy = await fetch_strategy.choose(domain)
+    if strategy == HTTP_ONLY and attempt > 0:
+        strategy = fetch_strategy.DEFAULT
+    FETCH_STRATEGY.inc(strategy=strategy)
+    allow_headless = cfg.headless_enabled and strategy != HTTP_ONLY
+    logger.info("scraper.fetch.start", trace_id=trace_id, story_id=story_id, url=canon_url, strategy=strategy)
     final_url, ctype, body, headers = None, None, None, None
     fetch_success = False
     used_headless = False
-    
-    try:
-        final_url, ctype, body, headers = _maybe_call_async(fetch_url, canon_url)
-        logger.info("scraper.fetch.success", trace_id=trace_id, story_id=story_id,
-                    final_url=final_url, content_type=ctype, body_size=len(body) if body else 0)
-        fetch_success = True
-    except RetryableFetch as e:
-        logger.warn("scraper.fetch.retryable_error", trace_id=trace_id, story_id=story_id, error=str(e))
-        # Try headless fallback for retryable errors before giving up
-        if cfg.headless_enabled:
-            logger.info("scraper.headless.retryable_fallback.start", trace_id=trace_id, story_id=story_id)
-            try:
-                headless = _maybe_call_async(headless_fetch, canon_url)
-                if headless:
-                    final_url, ctype, body, headers = headless
-                    logger.info("scraper.headless.retryable_fallback.success", trace_id=trace_id, story_id=story_id,
-                                final_url=final_url, content_type=ctype, body_size=len(body) if body else 0)
-                    fetch_success = True
-                    used_headless = True
-                else:
-                    logger.warn("scraper.headless.retryable_fallback.no_content", trace_id=trace_id, story_id=story_id)
-            except Exception as headless_e:
-                logger.error("scraper.headless.retryable_fallback.error", trace_id=trace_id, story_id=story_id, error=str(headless_e))
+    ex: Optional[Extraction] = None
+    cache = get_fetch_cache()
+    cached = None
+
+    if strategy == HEADLESS_FIRST:
+        # the plain fetch only runs if the browser comes back empty-handed
+        allow_headless = False
+        try:
+            with stage("headless"):
+                headless = await headless_fetch(canon_url)
+        except Exception as e:
+            logger.error("scraper.headless.strategy_first.error", trace_id=trace_id, story_id=story_id, error=str(e))
+            headless = None
+        if headless:
+            final_url, ctype, body, headers = headless
+            logger.info("scraper.headless.strategy_first.success", trace_id=trace_id, story_id=story_id,
+                        final_url=final_url, content_type=ctype, body_size=_body_size(body))
+            FETCH_BYTES.observe(_body_size(body), kind="headless")
+            HEADLESS.inc(trigger="strategy", result="success")
+            fetch_success = True
+            used_headless = True
+        else:
+            logger.warn("scraper.headless.strategy_first.no_content", trace_id=trace_id, story_id=story_id)
+            HEADLESS.inc(trigger="strategy", result="no_content")
+            await fetch_strategy.record(domain, "headless_fail")
+
+    if not fetch_success:
+        cached = await asyncio.to_thread(cache.lookup, canon_url) if cache else None
+        try:
+            with stage("fetch"):
+                final_url, ctype, body, headers = await fetch_url(
+                    canon_url, validators=cache.validators(cached) if cached else None)
+            logger.info("scraper.fetch.success", trace_id=trace_id, story_id=story_id,
+                        final_url=final_url, content_type=ctype, body_size=_body_size(body))
+            FETCH_BYTES.observe(_body_size(body), kind="pdf" if isinstance(body, Path) else "http")
+            fetch_success = True
+            if cache and isinstance(body, bytes):
+                cache.record_miss()
+                await asyncio.to_thread(cache.store, canon_url, final_url, ctype, headers, body)
+        except NotModified:
+            await asyncio.to_thread(cache.record_hit, canon_url)
+            final_url, ctype, headers = cached.final_url, cached.content_type, {}
+            if cached.extraction:
+                ex = Extraction(**cached.extraction)
+            else:
+                body = await asyncio.to_thread(cache.load_body, cached)
+            fetch_success = ex is not None or body is not None
+            logger.info("scraper.fetch.not_modified", trace_id=trace_id, story_id=story_id,
+                        final_url=final_url, cached_extraction=ex is not None)
+            if not fetch_success:
+                # body vanished between lookup and 304; the entry is gone, so a retry fetches in full
+                await circuit.report(domain, True, admission)
+                return await _handle_retry(job, reason="FETCH_CACHE_MISS", err="cached body missing")
+        except RetryableFetch as e:
+            logger.warn("scraper.fetch.retryable_error", trace_id=trace_id, story_id=story_id, error=str(e))
+            # Rate limited / overloaded: cool the whole host down, not just this job
+            sched = get_scheduler()
+            if sched is not None and e.status in (429, 503):
+                sched.penalize(domain, e.retry_after_s)
+            await fetch_strategy.record(domain, "blocked" if e.status in BLOCKED_STATUSES else "error")
+            # Try headless fallback for retryable errors before giving up
+            if allow_headless:
+                allow_headless = False
+                logger.info("scraper.headless.retryable_fallback.start", trace_id=trace_id, story_id=story_id)
+                try:
+                    headless = await headless_fetch(canon_url)
+                    if headless:
+                        final_url, ctype, body, headers = headless
+                        logger.info("scraper.headless.retryable_fallback.success", trace_id=trace_id, story_id=story_id,
+                                    final_url=final_url, content_type=ctype, body_size=_body_size(body))
+                        FETCH_BYTES.observe(_body_size(body), kind="headless")
+                        HEADLESS.inc(trigger="fetch_error", result="success")
+                        fetch_success = True
+                        used_headless = True
+                    else:
+                        logger.warn("scraper.headless.retryable_fallback.no_content", trace_id=trace_id, story_id=story_id)
+                        HEADLESS.inc(trigger="fetch_error", result="no_content")
+                        await fetch_strategy.record(domain, "headless_fail")
+                except Exception as headless_e:
+                    logger.error("scraper.headless.retryable_fallback.error", trace_id=trace_id, story_id=story_id, error=str(headless_e))
+                    HEADLESS.inc(trigger="fetch_error", result="error")
+                    await fetch_strategy.record(domain, "headless_fail")
         
-        if not fetch_success:
-            return _handle_retry(job, reason="FETCH_RETRY", err=str(e))
-    except NonRetryableFetch as e:
-        logger.error("scraper.fetch.nonretryable_error", trace_id=trace_id, story_id=story_id, error=str(e))
-        return _handle_dlq(job, reason="FETCH_NONRETRY", err=str(e))
+            if not fetch_success:
+                await circuit.report(domain, False, admission)
+                return await _handle_retry(job, reason="FETCH_RETRY", err=str(e))
+        # the host answered, just not with anything usable: not a circuit failure
+        except UnsupportedContent as e:
+            logger.warn("scraper.content.unsupported_mime", trace_id=trace_id, story_id=story_id,
+                        content_type=e.content_type, url=canon_url)
+            await circuit.report(domain, True, admission)
+            return await _handle_dlq(job, reason="UNSUPPORTED_MIME", err=e.content_type)
+        except BodyTooLarge as e:
+            logger.warn("scraper.content.too_large", trace_id=trace_id, story_id=story_id, error=str(e))
+            await circuit.report(domain, True, admission)
+            return await _handle_dlq(job, reason="BODY_TOO_LARGE", err=str(e))
+        except NonRetryableFetch as e:
+            logger.error("scraper.fetch.nonretryable_error", trace_id=trace_id, story_id=story_id, error=str(e))
+            await circuit.report(domain, True, admission)
+            return await _handle_dlq(job, reason="FETCH_NONRETRY", err=str(e))
 
     if not fetch_success:
         logger.error("scraper.fetch.failed_all_methods", trace_id=trace_id, story_id=story_id)
-        return _handle_retry(job, reason="FETCH_ALL_FAILED", err="both regular and headless fetch failed")
+        await circuit.report(domain, False, admission)
+        return await _handle_retry(job, reason="FETCH_ALL_FAILED", err="both regular and headless fetch failed")
+    await circuit.report(domain, True, admission)
 
-    if not ("html" in (ctype or "").lower() or (final_url or "").lower().endswith(".html")):
+    is_pdf = isinstance(body, Path)  # fetch_url streamed a PDF to a temp file
+    if not is_pdf and not is_html_response(ctype, final_url):
         logger.warn("scraper.content.unsupported_mime", trace_id=trace_id, story_id=story_id,
                        content_type=ctype, final_url=final_url)
-        return _handle_dlq(job, reason="UNSUPPORTED_MIME", err=ctype)
-
-    # 5) Decode + extract
-    html = decode_body(body)
-    logger.debug("scraper.content.html_decoded", trace_id=trace_id, story_id=story_id, html_size=len(html))
-
-    logger.info("scraper.extract.start", trace_id=trace_id, story_id=story_id)
-    text, headings, author = extract_content(html)
-    words = len((text or "").split())
-    is_paywalled = bool(words < 100 and any(k in html.lower() for k in ["subscribe", "paywall"]))
-    is_pdf = False
-    logger.info("scraper.extract.done", trace_id=trace_id, story_id=story_id,
-                word_count=words, headings_count=len(headings), author=author, is_paywalled=is_paywalled)
-
-    # 6) Headless fallback for empty content (only if we didn't already use headless for retryable errors)
-    if not text and cfg.headless_enabled and not used_headless:
+        return await _handle_dlq(job, reason="UNSUPPORTED_MIME", err=ctype)
+
+    # 5) Decode + extract (skipped when a 304 revalidated a cached extraction)
+    pool = get_extract_pool()
+    if is_pdf:
+        logger.info("scraper.extract.pdf.start", trace_id=trace_id, story_id=story_id, bytes=_body_size(body))
+        try:
+            with stage("analyze"):
+                ex = await pool.analyze_pdf(str(body), domain, cfg.allowed_langs, cfg.pdf_max_pages, cfg.pdf_timeout_s)
+            _record_worker_stages(ex)
+        except ExtractionTimeout as e:
+            logger.error("scraper.extract.timeout", trace_id=trace_id, story_id=story_id, error=str(e), is_pdf=True)
+            return await _handle_dlq(job, reason="EXTRACT_TIMEOUT", err=str(e))
+        except Exception as e:
+            logger.error("scraper.extract.pdf.error", trace_id=trace_id, story_id=story_id, error=str(e))
+            return await _handle_dlq(job, reason="PDF_PARSE", err=str(e))
+        finally:
+            body.unlink(missing_ok=True)
+        logger.info("scraper.extract.done", trace_id=trace_id, story_id=story_id,
+                    word_count=ex.words, author=ex.author, is_pdf=True)
+    elif ex is None:
+        with stage("decode"):
+            html = decode_body(body, ctype, utf8=used_headless)
+        logger.debug("scraper.content.html_decoded", trace_id=trace_id, story_id=story_id, html_size=len(html))
+
+        # extraction, language detection and hashing run in the extraction process pool
+        logger.info("scraper.extract.start", trace_id=trace_id, story_id=story_id)
+        try:
+            with stage("analyze"):
+                ex = await pool.analyze(html, domain, cfg.allowed_langs)
+            _record_worker_stages(ex)
+        except ExtractionTimeout as e:
+            logger.error("scraper.extract.timeout", trace_id=trace_id, story_id=story_id, error=str(e))
+            return await _handle_dlq(job, reason="EXTRACT_TIMEOUT", err=str(e))
+        logger.info("scraper.extract.done", trace_id=trace_id, story_id=story_id,
+                    word_count=ex.words, headings_count=len(ex.headings), author=ex.author, is_paywalled=ex.is_paywalled)
+
+    if used_headless:
+        await fetch_strategy.record(domain, "headless_ok" if ex.text else "headless_fail")
+    else:
+        await fetch_strategy.record(domain, "ok" if ex.text else "empty")
+
+    # 6) Headless fallback for empty content (only if headless hasn't been tried or ruled out)
+    if not ex.text and allow_headless and not is_pdf:
         logger.info("scraper.headless.content_fallback.start", trace_id=trace_id, story_id=story_id)
         try:
-            headless = _maybe_call_async(headless_fetch, final_url)
+            headless = await headless_fetch(final_url)
             if headless:
                 _fu, _ct, b2, _h2 = headless
-                html2 = b2.decode("utf-8", errors="ignore") if isinstance(b2, (bytes, bytearray)) else str(b2)
-                text, headings, author = extract_content(html2)
-                words = len((text or "").split())
-                logger.info("scraper.headless.content_fallback.success", trace_id=trace_id, story_id=story_id, word_count=words)
+                html2 = decode_body(b2, utf8=True)
+                ex = await pool.analyze(html2, domain, cfg.allowed_langs)
+                logger.info("scraper.headless.content_fallback.success", trace_id=trace_id, story_id=story_id, word_count=ex.words)
+                HEADLESS.inc(trigger="empty_content", result="success" if ex.text else "empty")
+                await fetch_strategy.record(domain, "headless_ok" if ex.text else "headless_fail")
             else:
                 logger.warn("scraper.headless.content_fallback.no_content", trace_id=trace_id, story_id=story_id)
+                HEADLESS.inc(trigger="empty_content", result="no_content")
+                await fetch_strategy.record(domain, "headless_fail")
         except Exception as e:
             logger.error("scraper.headless.content_fallback.error", trace_id=trace_id, story_id=story_id, error=str(e))
-
-    if not text:
+            HEADLESS.inc(trigger="empty_content", result="error")
+            await fetch_strategy.record(domain, "headless_fail")
+
+    if not ex.text and strategy == HTTP_ONLY and cfg.headless_enabled and not is_pdf:
+        # headless was skipped on the domain's record; the retry gets the fallback
+        logger.warn("scraper.content.empty_http_only", trace_id=trace_id, story_id=story_id)
+        return await _handle_retry(job, reason="EMPTY_CONTENT", err="no text after extraction (http_only)")
+    if not ex.text:
         logger.error("scraper.content.empty_after_extraction", trace_id=trace_id, story_id=story_id)
-        return _handle_dlq(job, reason="EMPTY_CONTENT", err="no text after extraction")
-
-    # 7) Language + content hash
-    logger.info("scraper.language.detect.start", trace_id=trace_id, story_id=story_id)
-    lang = detect_language(text, cfg.allowed_langs)
+        return await _handle_dlq(job, reason="EMPTY_CONTENT", err="no text after extraction")
+    if cache and not used_headless:
+        # no-op unless the body was cached above; lets the next 304 skip extraction
+        await asyncio.to_thread(cache.store_extraction, canon_url, asdict(ex))
+
+    # 7) Language + content hash (computed alongside extraction)
+    text, headings, author, words = ex.text, ex.headings, ex.author, ex.words
+    lang, chash, is_paywalled = ex.language, ex.content_hash, ex.is_paywalled
     if lang == "und":
         logger.warn("scraper.language.undetected", trace_id=trace_id, story_id=story_id)
     else:
         logger.info("scraper.language.detected", trace_id=trace_id, story_id=story_id, language=lang)
-
-    chash = content_hash(lang, domain, text)
     logger.debug("scraper.content.hash", trace_id=trace_id, story_id=story_id, content_hash=chash)
 
+    # 7b) Near-duplicate of an article we already have (syndication, AMP, mirrors):
+    # no new article; the story points at the existing one through story_duplicate
+    # and is enqueued under its id, so the summarizer's per-article claim dedups it
+    if ex.signature and cfg.near_dup_threshold > 0 and not force:
+        try:
+            dup = await _find_near_duplicate(ex.signature, cfg.near_dup_threshold)
+        except Exception:
+            dup = None  # logged in redis_io; store it as a new article
+        if dup:
+            logger.info("scraper.near_dup.hit", trace_id=trace_id, story_id=story_id,
+                        article_id=dup[0], similarity=round(dup[1], 3))
+            meta = {"author": author, "headings": headings[:5], "is_pdf": is_pdf,
+                    "is_paywalled": is_paywalled, "final_url": final_url}
+            outcome = await _link_to_existing(job, dup[0], domain, meta, via="near_dup", score=dup[1])
+            if outcome is not None:
+                return outcome
+
     # 8) DB txn
     logger.info("scraper.database.transaction.start", trace_id=trace_id, story_id=story_id)
     try:
-        with transaction() as conn:
-            article_id = upsert_article_tx(conn, lang, None, text, words, chash)
-            link_story_tx(conn, story_id, article_id, domain=domain, author=author)
+        # group-committed with other in-flight jobs' rows (one transaction per batch)
+        with stage("db"):
+            article_id = await get_article_writer().write(
+                ArticleRow(lang, text, words, chash, story_id, domain, author))
         logger.info("scraper.database.transaction.success", trace_id=trace_id, story_id=story_id, article_id=article_id)
     except Exception as e:
         logger.error("scraper.database.transaction.error", trace_id=trace_id, story_id=story_id, error=str(e))
-        return _handle_retry(job, reason="DB_ERROR", err=str(e))
+        return await _handle_retry(job, reason="DB_ERROR", err=str(e))
+
+    if cfg.canon_index_ttl_s > 0:
+        entry = {"article_id": article_id, "final_url": final_url, "headings": headings[:5], "author": author,
+                 "is_pdf": is_pdf, "is_paywalled": is_paywalled}
+        try:
+            await aset_canonical_article(canon_url, entry, cfg.canon_index_ttl_s)
+        except Exception:
+            pass  # logged in redis_io; reposts just take the full path
+    if ex.signature and cfg.near_dup_threshold > 0:
+        try:
+            sig = decode_signature(ex.signature)
+            await alsh_add(article_id, ex.signature, band_keys(sig), cfg.near_dup_ttl_s)
+        except Exception:
+            pass  # logged in redis_io; later copies just won't match this one
 
     # 9) Enqueue summarizer
     logger.info("scraper.summarizer.enqueue.start", trace_id=trace_id, story_id=story_id, article_id=article_id)
     payload = build_summarizer_payload(trace_id, story, article_id, lang, text, headings,
                                        is_pdf, is_paywalled, domain, final_url)
     try:
-        lpush(cfg.summarizer_queue, payload)
+        # enqueue + done-marker in one MULTI: no window where only one of them lands
+        with stage("enqueue"):
+            await aenqueue_and_mark_done(cfg.summarizer_queue, payload, story_id)
         logger.info("scraper.summarizer.enqueue.success", trace_id=trace_id, story_id=story_id,
                     article_id=article_id, queue=cfg.summarizer_queue)
-        set_idempotent_done(story_id)
     except Exception as e:
         logger.error("scraper.summarizer.enqueue.error", trace_id=trace_id, story_id=story_id,
                      article_id=article_id, error=str(e))
-        return _handle_retry(job, reason="REDIS_OUT", err=str(e))
+        return await _handle_retry(job, reason="REDIS_OUT", err=str(e))
 
     logger.info("scraper.job.completed", trace_id=trace_id, story_id=story_id, article_id=article_id)
+    JOBS_COMPLETED.inc(via="pdf" if is_pdf else "headless" if used_headless else "fetch")
     return True
 
 
 # ---- retry / DLQ -------------------------------------------------------------------
 
-def _handle_retry(job: Dict[str, Any], reason: str, err: str) -> bool:
+async def _handle_retry(job: Dict[str, Any], reason: str, err: str) -> bool:
     cfg = load_config()
     attempt = int(job.get("attempt", 0)) + 1
     trace_id = job.get("trace_id")
@@ -260,37 +650,63 @@ def _handle_retry(job: Dict[str, Any], reason: str, err: str) -> bool:
         delay_ms = int((2 ** attempt) * 1000 * (1.0 + random.random() * 0.25))
         job["attempt"] = attempt
         job["visible_at"] = _now_ms() + delay_ms
-        rpush(cfg.retry_queue, job)
+        await aschedule_delayed(cfg.retry_queue, job, job["visible_at"])
         logger.warn("scraper.job.requeued", trace_id=trace_id, story_id=story_id,
-                       attempt=attempt, reason=reason, delay_ms=delay_ms, queue=cfg.retry_queue)
+                       attempt=attempt, reason=reason, delay_ms=delay_ms, queue=delayed_key(cfg.retry_queue))
+        JOB_OUTCOMES.inc(reason=reason, action="retry")
     else:
         logger.error("scraper.job.max_retries_exceeded", trace_id=trace_id, story_id=story_id,
                      attempt=attempt, reason=reason)
-        _handle_dlq(job, reason=reason, err=err)
+        await _handle_dlq(job, reason=reason, err=err)
+    return True
+
+
+async def _park_for_circuit(job: Dict[str, Any], domain: str, retry_at_ms: int) -> bool:
+    """Send a job for a domain with an open circuit to the delayed retry set.
+
+    Not an attempt: `attempt` is left alone so the retry budget is kept for real
+    failures. Jitter spreads the parked jobs out once the circuit lets them through.
+    """
+    cfg = load_config()
+    job["visible_at"] = max(retry_at_ms, _now_ms()) + random.randint(0, 1000)
+    await aschedule_delayed(cfg.retry_queue, job, job["visible_at"])
+    logger.info("scraper.job.circuit_parked", trace_id=job.get("trace_id"), story_id=job.get("story", {}).get("id"),
+                domain=domain, visible_at=job["visible_at"], queue=delayed_key(cfg.retry_queue))
+    JOB_OUTCOMES.inc(reason="CIRCUIT_OPEN", action="park")
     return True
 
 
-def _handle_dlq(job: Dict[str, Any], reason: str, err: str) -> bool:
+async def _handle_dlq(job: Dict[str, Any], reason: str, err: str) -> bool:
     cfg = load_config()
     trace_id = job.get("trace_id")
     story_id = job.get("story", {}).get("id")
     payload = {"reason": reason, "err": err, "job": job}
-    rpush(cfg.dlq, payload)
+    await arpush(cfg.dlq, payload)
     logger.error("scraper.job.dlq", trace_id=trace_id, story_id=story_id, reason=reason, queue=cfg.dlq)
+    JOB_OUTCOMES.inc(reason=reason, action="dlq")
     return True
 
 
 # ---- single-worker loop ------------------------------------------------------------
 
 def main() -> None:
+    install_reload_handlers()
     cfg = load_config()
+    if cfg.daemon:
+        # resident: the concurrent worker (the image's CMD), which already keeps one
+        # loop, the host scheduler and leases, and drains on SIGTERM
+        from .worker import worker_main
+        asyncio.run(worker_main())
+        return
     logger.info(
         "scraper.worker.start",
         queues={"in": cfg.input_queue, "out": cfg.summarizer_queue, "retry": cfg.retry_queue, "dlq": cfg.dlq},
         concurrency=1,
         max_retries=cfg.max_retries,
         headless_enabled=cfg.headless_enabled,
+        psl_snapshot=PSL_SNAPSHOT_VERSION,
     )
+    start_metrics_server(cfg.metrics_port)
 
     processed_count = 0
     while True:
@@ -312,6 +728,8 @@ def main() -> None:
                     close_pool()
                 except Exception:
                     pass
+                close_extract_pool()
+                close_fetch_cache()
                 return
         except Exception as e:
             logger.error("scraper.loop.error", error=str(e), processed_count=processed_count)
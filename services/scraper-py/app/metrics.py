@@ -0,0 +1,277 @@
+"""In-process Prometheus metrics for the scraper, served as text on PORT (/metrics).
+
+Deliberately dependency-free: a handful of counters, gauges and histograms kept
+under one lock, rendered in the Prometheus text exposition format by a daemon
+HTTP thread. The thread is independent of any event loop, so the same server
+covers the concurrent worker and the one-shot process_one() loop (which runs a
+fresh asyncio loop per job).
+"""
+import bisect
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .config import load_config
+from .logging import logger
+from .normalize import PSL_SNAPSHOT_VERSION
+from .redis_io import circuit_states, client, delayed_key
+from .scheduler import get_scheduler
+from .stages import add_stage_observer
+
+_lock = threading.Lock()
+_registry: List["_Metric"] = []
+_collectors: List[Callable[[], None]] = []
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if v != int(v) else str(int(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labels)
+
+    def _label_str(self, key: LabelValues, extra: str = "") -> str:
+        parts = [f'{n}="{_escape(v)}"' for n, v in zip(self.labels, key)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        head = f"# HELP {self.name} {self.help}\n# TYPE {self.name} {self.kind}\n"
+        return head + "".join(s + "\n" for s in self._samples())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{self._label_str(k)} {_fmt(v)}" for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        with _lock:
+            self._values[self._key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def replace(self, values: Dict[LabelValues, float]) -> None:
+        """Swap in a whole new label set -> value map (drops label sets no longer present)."""
+        with _lock:
+            self._values = {tuple(str(v) for v in k): float(n) for k, n in values.items()}
+
+    @contextmanager
+    def track(self, **labels: str) -> Iterator[None]:
+        """+1 for the duration of the block."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{self._label_str(k)} {_fmt(v)}" for k, v in self._values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float], labels: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., +Inf count], sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            counts, total = self._values.get(key) or self._values.setdefault(
+                key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[i] += 1
+            total[0] += value
+
+    def _samples(self) -> List[str]:
+        out = []
+        for key, (counts, total) in self._values.items():
+            cum = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cum += n
+                le = 'le="%s"' % _fmt(bound)
+                out.append(f"{self.name}_bucket{self._label_str(key, le)} {cum}")
+            out.append(f"{self.name}_sum{self._label_str(key)} {_fmt(total[0])}")
+            out.append(f"{self.name}_count{self._label_str(key)} {cum}")
+        return out
+
+
+def add_collector(fn: Callable[[], None]) -> None:
+    """Run `fn` before every scrape, e.g. to sample queue depths into a Gauge."""
+    if fn not in _collectors:
+        _collectors.append(fn)
+
+
+def render() -> str:
+    for fn in list(_collectors):
+        try:
+            fn()
+        except Exception as e:
+            logger.debug("scraper.metrics.collector_error", error=str(e))
+    with _lock:
+        return "".join(m.render() for m in _registry)
+
+
+# ---- scraper metrics ---------------------------------------------------------------
+
+_SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+_BYTES = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+STAGE_SECONDS = Histogram("scraper_stage_seconds", "Time spent per pipeline stage (fetch, extract, db, ...)",
+                          _SECONDS, labels=("stage",))
+FETCH_BYTES = Histogram("scraper_fetch_bytes", "Size of fetched response bodies", _BYTES, labels=("kind",))
+JOB_OUTCOMES = Counter("scraper_job_outcomes_total",
+                       "Jobs sent to retry, parked or sent to the DLQ, by reason (FETCH_RETRY, UNSUPPORTED_MIME, EMPTY_CONTENT, ...)",
+                       labels=("reason", "action"))
+JOBS_COMPLETED = Counter("scraper_jobs_completed_total", "Jobs that produced a summarizer payload",
+                         labels=("via",))
+HEADLESS = Counter("scraper_headless_total", "Headless browser fallbacks by trigger and result",
+                   labels=("trigger", "result"))
+FETCH_STRATEGY = Counter("scraper_fetch_strategy_total",
+                         "Fetch strategy picked per job from the domain's outcome history",
+                         labels=("strategy",))
+HTTP_POOL = Counter("scraper_http_pool_requests_total",
+                    "Fetches that found a reusable keep-alive connection (hit) or had to open one (miss)",
+                    labels=("result",))
+JOBS_IN_FLIGHT = Gauge("scraper_jobs_in_flight", "Jobs currently being processed")
+QUEUE_DEPTH = Gauge("scraper_queue_depth", "Length of the scraper's Redis queues, sampled per scrape",
+                    labels=("queue",))
+SCHEDULER_PENDING = Gauge("scraper_scheduler_pending", "Jobs parked in the per-host scheduler")
+CIRCUIT_STATE = Gauge("scraper_circuit_state",
+                      "Domains whose circuit breaker is not closed (1 = open, 0.5 = half-open), sampled per scrape",
+                      labels=("domain",))
+CIRCUIT_TRANSITIONS = Counter("scraper_circuit_transitions_total",
+                              "Circuit breaker transitions made by this worker, by the state entered",
+                              labels=("state",))
+PSL_SNAPSHOT = Gauge("scraper_psl_snapshot_info",
+                     "Public suffix list snapshot behind registrable domains (always 1)", labels=("version",))
+PSL_SNAPSHOT.set(1, version=PSL_SNAPSHOT_VERSION)
+
+
+def _observe_stage(name: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage=name)
+
+
+add_stage_observer(_observe_stage)
+
+
+def _sample_queues() -> None:
+    cfg = load_config()
+    queues = (cfg.input_queue, cfg.retry_queue, cfg.summarizer_queue, cfg.dlq)
+    pipe = client().pipeline(transaction=False)
+    for q in queues:
+        pipe.llen(q)
+    pipe.zcard(delayed_key(cfg.retry_queue))
+    depths = pipe.execute()
+    for q, n in zip(queues + (delayed_key(cfg.retry_queue),), depths):
+        QUEUE_DEPTH.set(n, queue=q)
+    sched = get_scheduler()
+    if sched is not None:
+        SCHEDULER_PENDING.set(sched.max_pending - sched.room())
+
+
+add_collector(_sample_queues)
+
+
+def _sample_circuits() -> None:
+    if not load_config().circuit_enabled:
+        return
+    CIRCUIT_STATE.replace({(domain,): 1.0 if state == "open" else 0.5
+                           for domain, state in circuit_states().items()})
+
+
+add_collector(_sample_circuits)
+
+
+# ---- HTTP endpoint -----------------------------------------------------------------
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass  # scrapes every few seconds would drown the JSON log
+
+
+_server: Optional[ThreadingHTTPServer] = None
+
+
+def start_metrics_server(port: int) -> None:
+    """Serve /metrics on `port` from a daemon thread; no-op if already running or port <= 0."""
+    global _server
+    if _server is not None or port <= 0:
+        return
+    try:
+        _server = ThreadingHTTPServer(("0.0.0.0", port), _Handler)
+    except OSError as e:
+        logger.error("scraper.metrics.bind_failed", port=port, error=str(e))
+        return
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info("scraper.metrics.listening", port=port)
+
+
+def stop_metrics_server() -> None:
+    global _server
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
@@ -0,0 +1,77 @@
+import base64
+import hashlib
+import re
+import zlib
+from typing import List, Optional
+
+import numpy as np
+
+
+# 128 permutations in 16 bands of 8 rows: pages become LSH candidates from
+# roughly 0.7 Jaccard similarity; candidates are then confirmed on the full
+# signature against NEAR_DUP_THRESHOLD.
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_WORDS = 5
+MIN_SHINGLES = 20        # fewer distinct shingles than this gives a meaningless signature
+MAX_WORDS = 20000
+_CHUNK = 4096            # shingles hashed per step; bounds the (NUM_PERM x chunk) matrix
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# multiply-shift hash family: h(x) = (a*x + b mod 2^64) >> 32 with odd a
+_rng = np.random.default_rng(0x5EED)
+_A = (_rng.integers(1, 2**63, size=NUM_PERM, dtype=np.uint64) | np.uint64(1))[:, None]
+_B = _rng.integers(0, 2**63, size=NUM_PERM, dtype=np.uint64)[:, None]
+_SHIFT = np.uint64(32)
+_MUL = np.uint64(1000003)
+
+
+def _shingle_hashes(text: str) -> np.ndarray:
+    """Distinct 64-bit hashes of every SHINGLE_WORDS-word window of the lowercased text."""
+    words = _WORD_RE.findall((text or "").lower())[:MAX_WORDS]
+    n = len(words) - SHINGLE_WORDS + 1
+    if n <= 0:
+        return np.empty(0, dtype=np.uint64)
+    wh = np.fromiter((zlib.crc32(w.encode("utf-8")) for w in words), dtype=np.uint64, count=len(words))
+    h = np.zeros(n, dtype=np.uint64)
+    for i in range(SHINGLE_WORDS):
+        h = h * _MUL + wh[i:i + n]
+    return np.unique(h)
+
+
+def minhash(text: str) -> Optional[np.ndarray]:
+    """MinHash signature (NUM_PERM uint32) of the text's word shingles, or None if too short."""
+    sh = _shingle_hashes(text)
+    if sh.size < MIN_SHINGLES:
+        return None
+    sig = np.full(NUM_PERM, np.iinfo(np.uint64).max, dtype=np.uint64)
+    for start in range(0, sh.size, _CHUNK):
+        part = sh[None, start:start + _CHUNK]
+        np.minimum(sig, ((_A * part + _B) >> _SHIFT).min(axis=1), out=sig)
+    return sig.astype(np.uint32)
+
+
+def encode_signature(sig: np.ndarray) -> str:
+    return base64.b64encode(sig.astype("<u4").tobytes()).decode("ascii")
+
+
+def decode_signature(s: str) -> Optional[np.ndarray]:
+    try:
+        sig = np.frombuffer(base64.b64decode(s), dtype="<u4")
+    except Exception:
+        return None
+    return sig if sig.size == NUM_PERM else None
+
+
+def band_keys(sig: np.ndarray) -> List[str]:
+    """One bucket id per band; identical bands land in the same bucket."""
+    raw = sig.astype("<u4")
+    return [f"{b}:{hashlib.blake2b(raw[b * ROWS:(b + 1) * ROWS].tobytes(), digest_size=8).hexdigest()}"
+            for b in range(BANDS)]
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the two shingle sets."""
+    return float(np.count_nonzero(a == b)) / NUM_PERM
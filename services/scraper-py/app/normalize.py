@@ -1,8 +1,11 @@
+import functools
 import hashlib
 import math
+import os
 import re
 import time
-from typing import Dict, Tuple, Optional
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Tuple, Optional
 from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
 
 import langid
@@ -12,20 +15,141 @@ import tldextract
 TRACKING_PARAMS = {"utm_source","utm_medium","utm_campaign","utm_term","utm_content","fbclid","gclid","mc_cid","mc_eid"}
 
 
+# Public suffix data never comes from the network: by default tldextract's own
+# snapshot (bundled with the pinned package version) is used; PSL_SNAPSHOT_PATH
+# may point at a public_suffix_list.dat shipped with the image instead. Which one
+# is in use goes into the worker start log and scraper_psl_snapshot_info.
+PSL_SNAPSHOT_PATH = os.environ.get("PSL_SNAPSHOT_PATH") or None
+PSL_SNAPSHOT_VERSION = (
+    f"file:{os.path.basename(PSL_SNAPSHOT_PATH)}" if PSL_SNAPSHOT_PATH else f"tldextract-{tldextract.__version__}"
+)
+
+_tld: Optional[tldextract.TLDExtract] = None
+
+
+def _extractor() -> tldextract.TLDExtract:
+    global _tld
+    if _tld is None:
+        urls = (f"file://{os.path.abspath(PSL_SNAPSHOT_PATH)}",) if PSL_SNAPSHOT_PATH else ()
+        # cache_dir=None: no disk cache to go stale or write to in read-only sandboxes
+        _tld = tldextract.TLDExtract(cache_dir=None, suffix_list_urls=urls, fallback_to_snapshot=True)
+    return _tld
+
+
+@functools.lru_cache(maxsize=65536)
+def registrable_domain(host: str) -> str:
+    """eTLD+1 for a host[:port] ("news.bbc.co.uk" -> "bbc.co.uk"); IPs and bare names come back as-is."""
+    ext = _extractor()(host)
+    return ".".join(part for part in [ext.domain, ext.suffix] if part)
+
+
 def canonicalize_url(url: str) -> Tuple[str, str]:
     p = urlparse(url)
     qs = [(k, v) for k, v in parse_qsl(p.query, keep_blank_values=False) if k.lower() not in TRACKING_PARAMS]
     cleaned = p._replace(query=urlencode(qs, doseq=True), fragment="")
     canon = urlunparse(cleaned)
-    ext = tldextract.extract(canon)
-    domain = ".".join(part for part in [ext.domain, ext.suffix] if part)
+    # only host[:port] matters for the domain (case kept: it feeds content_hash);
+    # scheme-less input goes to tldextract whole
+    domain = registrable_domain(p.netloc.rpartition("@")[2] if p.netloc else canon)
     return canon, domain
 
 
-def detect_language(text: str, allowed_csv: Optional[str] = None) -> str:
+def canonicalize_urls(urls: Iterable[str]) -> List[Tuple[str, str]]:
+    """canonicalize_url over many URLs (backfills); unparseable ones come back as (url, "")."""
+    out: List[Tuple[str, str]] = []
+    for url in urls:
+        try:
+            out.append(canonicalize_url(url))
+        except ValueError:
+            out.append((url, ""))
+    return out
+
+
+LANG_SAMPLE_CHARS = 2000     # langid accuracy plateaus well below this
+LANG_MIN_PARAGRAPH = 40      # shorter blocks are mostly nav, captions, bylines
+DOMAIN_STABLE_AFTER = 5      # same language this many times in a row -> trust it
+DOMAIN_RECHECK_EVERY = 20    # ...but still classify every Nth page from that domain
+_MAX_DOMAINS = 4096
+
+
+def preload_language_model() -> None:
+    """Load langid's model now instead of on the first classify() of a process."""
+    if langid.langid.identifier is None:
+        langid.langid.load_model()
+
+
+def language_sample(text: str, max_chars: int = LANG_SAMPLE_CHARS) -> str:
+    """A bounded, representative slice of `text` for language identification.
+
+    Short texts are returned whole. Otherwise substantial paragraphs are picked
+    evenly from beginning to end until `max_chars` is reached, so a long English
+    intro can't hide a body in another language (and vice versa).
+    """
+    if len(text) <= max_chars:
+        return text
+    # trafilatura separates paragraphs with a single newline, not a blank line
+    paras = [p for p in (x.strip() for x in re.split(r"\n+", text)) if len(p) >= LANG_MIN_PARAGRAPH]
+    if not paras:
+        return text[:max_chars]
+    avg = sum(len(p) + 2 for p in paras) / len(paras)
+    k = max(1, min(len(paras), int(max_chars / avg) + 1))
+    idx = sorted({round(i * (len(paras) - 1) / max(1, k - 1)) for i in range(k)})
+    return "\n\n".join(paras[i] for i in idx)[:max_chars]
+
+
+class DomainLanguageCache:
+    """Per-domain language memory for domains that always publish in one language.
+
+    After DOMAIN_STABLE_AFTER consecutive identical detections a domain's language
+    is reused without classifying, except every DOMAIN_RECHECK_EVERY-th page,
+    which is classified to confirm; a mismatch resets the streak.
+    """
+
+    def __init__(self, max_domains: int = _MAX_DOMAINS) -> None:
+        self.max_domains = max_domains
+        self._d: "OrderedDict[str, List]" = OrderedDict()  # domain -> [lang, streak, served]
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, domain: str) -> Optional[str]:
+        e = self._d.get(domain)
+        if e is None or e[1] < DOMAIN_STABLE_AFTER:
+            self.misses += 1
+            return None
+        e[2] += 1
+        if e[2] % DOMAIN_RECHECK_EVERY == 0:
+            self.misses += 1
+            return None
+        self._d.move_to_end(domain)
+        self.hits += 1
+        return e[0]
+
+    def observe(self, domain: str, lang: str) -> None:
+        e = self._d.get(domain)
+        if e is None:
+            self._d[domain] = [lang, 1, 0]
+            if len(self._d) > self.max_domains:
+                self._d.popitem(last=False)
+            return
+        if e[0] == lang:
+            e[1] += 1
+        else:
+            e[0], e[1], e[2] = lang, 1, 0
+        self._d.move_to_end(domain)
+
+
+_domain_langs = DomainLanguageCache()
+
+
+def detect_language(text: str, allowed_csv: Optional[str] = None, domain: Optional[str] = None) -> str:
+    """langid on a bounded sample of `text`; with `domain`, stable domains skip classification."""
     if not text:
         return "und"
-    lang, _ = langid.classify(text)
+    lang = _domain_langs.get(domain) if domain else None
+    if lang is None:
+        lang, _ = langid.classify(language_sample(text))
+        if domain:
+            _domain_langs.observe(domain, lang)
     if allowed_csv:
         allowed = {x.strip() for x in allowed_csv.split(",") if x.strip()}
         if lang not in allowed:
@@ -1,14 +1,22 @@
+import asyncio
+import hashlib
 import json
+import os
+import socket
 import time
-from typing import Any, Dict, Optional, Tuple
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
 
 from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
 from app.logging import _safe_default
 from .config import load_config
 from .logging import logger
 
 
 _r: Redis | None = None
+_ar: AsyncRedis | None = None
+_ar_loop: asyncio.AbstractEventLoop | None = None
 
 
 def client() -> Redis:
@@ -86,4 +94,651 @@ def set_idempotent_done(story_id: str, ttl_sec: int = 7 * 24 * 3600) -> None:
         client().set(key, "1", ex=ttl_sec)
     except Exception as e:
         logger.error("redis.idem.mark.error", story_id=story_id, key=key, error=str(e))
-        raise
\ No newline at end of file
+        raise
+
+
+# ---- delayed retries ---------------------------------------------------------------
+# Retries wait in a sorted set scored by visible_at (ms) next to their list
+# (`<queue>:delayed`). Due jobs are moved into the list in batches by one Lua
+# script, so consumers of the list only ever see jobs that are ready to run.
+
+_PROMOTE_LUA = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+if #due > 0 then
+  redis.call('ZREM', KEYS[1], unpack(due))
+  redis.call('RPUSH', KEYS[2], unpack(due))
+end
+return #due
+"""
+PROMOTE_BATCH = 100
+
+
+def delayed_key(queue: str) -> str:
+    return f"{queue}:delayed"
+
+
+def schedule_delayed(queue: str, payload: Dict[str, Any], visible_at_ms: int) -> None:
+    key = delayed_key(queue)
+    logger.debug("redis.delayed.schedule", queue=queue, key=key, visible_at=visible_at_ms)
+    try:
+        client().zadd(key, {json.dumps(payload, default=_safe_default): int(visible_at_ms)})
+    except Exception as e:
+        logger.error("redis.delayed.schedule.error", queue=queue, key=key, error=str(e))
+        raise
+
+
+def promote_due(queue: str, limit: int = PROMOTE_BATCH) -> int:
+    """Move every job whose visible_at has passed onto `queue`; returns how many moved."""
+    script = client().register_script(_PROMOTE_LUA)
+    moved = 0
+    while True:
+        n = int(script(keys=[delayed_key(queue), queue], args=[int(time.time() * 1000), limit]))
+        moved += n
+        if n < limit:
+            break
+    if moved:
+        logger.debug("redis.delayed.promoted", queue=queue, count=moved)
+    return moved
+
+
+# ---- asyncio client ----------------------------------------------------------------
+# The async client is bound to the event loop that created it, so we keep one per
+# running loop (the concurrent worker has exactly one long-lived loop).
+
+def aclient() -> AsyncRedis:
+    global _ar, _ar_loop
+    loop = asyncio.get_running_loop()
+    if _ar is None or _ar_loop is not loop:
+        cfg = load_config()
+        logger.info("redis.aclient.connecting", url=cfg.redis_url)
+        _ar = AsyncRedis.from_url(cfg.redis_url, decode_responses=True, health_check_interval=10)
+        _ar_loop = loop
+    return _ar
+
+
+async def aclose() -> None:
+    global _ar, _ar_loop
+    if _ar is None:
+        return
+    try:
+        await _ar.aclose()
+    except Exception:
+        pass
+    _ar, _ar_loop = None, None
+
+
+async def arpush(queue: str, payload: Dict[str, Any]) -> None:
+    key = queue
+    logger.debug("redis.rpush.start", queue=queue, key=key)
+    try:
+        await aclient().rpush(key, json.dumps(payload, default=_safe_default))
+        logger.debug("redis.rpush.success", queue=queue, key=key)
+    except Exception as e:
+        logger.error("redis.rpush.error", queue=queue, key=key, error=str(e))
+        raise
+
+
+async def alpush(queue: str, payload: Dict[str, Any]) -> int:
+    logger.debug("redis.lpush.start", queue=queue)
+    try:
+        result = await aclient().lpush(queue, json.dumps(payload, default=_safe_default))
+        logger.debug("redis.lpush.success", queue=queue, list_length=result)
+        return result
+    except Exception as e:
+        logger.error("redis.lpush.error", queue=queue, error=str(e))
+        raise
+
+
+async def aschedule_delayed(queue: str, payload: Dict[str, Any], visible_at_ms: int) -> None:
+    key = delayed_key(queue)
+    logger.debug("redis.delayed.schedule", queue=queue, key=key, visible_at=visible_at_ms)
+    try:
+        await aclient().zadd(key, {json.dumps(payload, default=_safe_default): int(visible_at_ms)})
+    except Exception as e:
+        logger.error("redis.delayed.schedule.error", queue=queue, key=key, error=str(e))
+        raise
+
+
+async def apromote_due(queue: str, limit: int = PROMOTE_BATCH) -> int:
+    script = aclient().register_script(_PROMOTE_LUA)
+    moved = 0
+    while True:
+        n = int(await script(keys=[delayed_key(queue), queue], args=[int(time.time() * 1000), limit]))
+        moved += n
+        if n < limit:
+            break
+    if moved:
+        logger.debug("redis.delayed.promoted", queue=queue, count=moved)
+    return moved
+
+
+async def anext_due_ms(queue: str) -> Optional[int]:
+    """visible_at (ms) of the earliest parked retry for `queue`, or None if there is none."""
+    head = await aclient().zrange(delayed_key(queue), 0, 0, withscores=True)
+    return int(head[0][1]) if head else None
+
+
+# ---- batched / pipelined ops ---------------------------------------------------------
+
+# Pop up to ARGV[1] items from KEYS in priority order (LMPOP needs Redis 7; this
+# works everywhere). Returns a flat [key, value, key, value, ...] list.
+_BATCH_POP_LUA = """
+local want = tonumber(ARGV[1])
+local out = {}
+for _, key in ipairs(KEYS) do
+  if want <= 0 then break end
+  local items = redis.call('LRANGE', key, 0, want - 1)
+  if #items > 0 then
+    redis.call('LTRIM', key, #items, -1)
+    for _, v in ipairs(items) do
+      out[#out + 1] = key
+      out[#out + 1] = v
+    end
+    want = want - #items
+  end
+end
+return out
+"""
+
+
+def _parse_item(queue: str, v: str) -> Dict[str, Any]:
+    try:
+        return json.loads(v)
+    except Exception as e:
+        logger.warn("redis.blpop.json_parse_error", queue=queue, key=queue, error=str(e))
+        return {"raw": v}
+
+
+async def abatch_pop(queues: List[str], count: int, timeout: int = 5) -> List[Tuple[str, Dict[str, Any]]]:
+    """Pop up to `count` items across `queues` (earlier queues first) in one round trip.
+
+    Blocks up to `timeout` seconds only when every queue is empty.
+    """
+    r = aclient()
+    script = r.register_script(_BATCH_POP_LUA)
+    logger.debug("redis.batch_pop.start", queues=queues, count=count, timeout=timeout)
+    try:
+        flat = await script(keys=queues, args=[count])
+        if not flat:
+            res = await r.blpop(queues, timeout=timeout)
+            if not res:
+                logger.debug("redis.blpop.timeout", queue=queues, key=queues)
+                return []
+            flat = list(res)
+            if count > 1:
+                flat += await script(keys=queues, args=[count - 1])
+    except Exception as e:
+        logger.error("redis.batch_pop.error", queues=queues, error=str(e))
+        raise
+    out = [(flat[i], _parse_item(flat[i], flat[i + 1])) for i in range(0, len(flat), 2)]
+    logger.debug("redis.batch_pop.success", queues=queues, count=len(out))
+    return out
+
+
+async def adone_story_ids(story_ids: List[str]) -> set:
+    """Which of `story_ids` already carry a done-marker (one pipelined round trip)."""
+    if not story_ids:
+        return set()
+    try:
+        async with aclient().pipeline(transaction=False) as pipe:
+            for sid in story_ids:
+                pipe.exists(f"scraper:done:{sid}")
+            found = await pipe.execute()
+    except Exception as e:
+        logger.error("redis.idem.check.error", story_ids=len(story_ids), error=str(e))
+        raise
+    return {sid for sid, n in zip(story_ids, found) if n}
+
+
+async def aenqueue_and_mark_done(queue: str, payload: Dict[str, Any], story_id: str,
+                                 ttl_sec: int = 7 * 24 * 3600) -> int:
+    """LPUSH the summarizer job and set the done-marker atomically (MULTI/EXEC)."""
+    key = f"scraper:done:{story_id}"
+    logger.debug("redis.enqueue_done.start", queue=queue, story_id=story_id, key=key)
+    try:
+        async with aclient().pipeline(transaction=True) as pipe:
+            pipe.lpush(queue, json.dumps(payload, default=_safe_default))
+            pipe.set(key, "1", ex=ttl_sec)
+            length, _ = await pipe.execute()
+        logger.debug("redis.enqueue_done.success", queue=queue, story_id=story_id, list_length=length)
+        return length
+    except Exception as e:
+        logger.error("redis.enqueue_done.error", queue=queue, story_id=story_id, error=str(e))
+        raise
+
+
+async def ais_idempotent_done(story_id: str) -> bool:
+    key = f"scraper:done:{story_id}"
+    logger.debug("redis.idem.check", story_id=story_id, key=key)
+    try:
+        return (await aclient().exists(key)) == 1
+    except Exception as e:
+        logger.error("redis.idem.check.error", story_id=story_id, key=key, error=str(e))
+        raise
+
+
+# ---- canonical URL -> article index ------------------------------------------------
+# Reposts of a link arrive under new story ids; this maps a canonical URL to the
+# article it already produced so the repost can skip fetch + extract entirely.
+
+def _canon_key(canon_url: str) -> str:
+    return "scraper:canon:" + hashlib.sha1(canon_url.encode("utf-8")).hexdigest()
+
+
+async def aget_canonical_article(canon_url: str) -> Optional[Dict[str, Any]]:
+    key = _canon_key(canon_url)
+    logger.debug("redis.canon.get", url=canon_url, key=key)
+    try:
+        raw = await aclient().get(key)
+    except Exception as e:
+        logger.error("redis.canon.get.error", url=canon_url, key=key, error=str(e))
+        raise
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except Exception:
+        return None
+
+
+async def aset_canonical_article(canon_url: str, entry: Dict[str, Any], ttl_sec: int) -> None:
+    key = _canon_key(canon_url)
+    logger.debug("redis.canon.set", url=canon_url, key=key, ttl=ttl_sec)
+    try:
+        await aclient().set(key, json.dumps(entry, default=_safe_default), ex=ttl_sec)
+    except Exception as e:
+        logger.error("redis.canon.set.error", url=canon_url, key=key, error=str(e))
+        raise
+
+
+async def adelete_canonical_article(canon_url: str) -> None:
+    try:
+        await aclient().delete(_canon_key(canon_url))
+    except Exception as e:
+        logger.error("redis.canon.delete.error", url=canon_url, error=str(e))
+
+
+# ---- near-duplicate LSH index -------------------------------------------------------
+# One SET of article ids per (band, bucket) plus each article's full signature, so
+# candidates can be confirmed on the whole signature. Everything expires after ttl.
+
+_LSH_MAX_CANDIDATES = 50
+
+
+async def alsh_candidates(band_keys: List[str]) -> Dict[str, str]:
+    """article_id -> encoded signature for every article sharing a band bucket."""
+    r = aclient()
+    try:
+        async with r.pipeline(transaction=False) as pipe:
+            for bk in band_keys:
+                pipe.smembers(f"scraper:lsh:b:{bk}")
+            buckets = await pipe.execute()
+        ids: List[str] = []
+        for members in buckets:
+            for aid in members:
+                if aid not in ids:
+                    ids.append(aid)
+        ids = ids[:_LSH_MAX_CANDIDATES]
+        if not ids:
+            return {}
+        sigs = await r.mget([f"scraper:lsh:sig:{aid}" for aid in ids])
+    except Exception as e:
+        logger.error("redis.lsh.query.error", error=str(e))
+        raise
+    return {aid: sig for aid, sig in zip(ids, sigs) if sig}
+
+
+async def alsh_add(article_id: str, signature: str, band_keys: List[str], ttl_sec: int) -> None:
+    try:
+        async with aclient().pipeline(transaction=False) as pipe:
+            pipe.set(f"scraper:lsh:sig:{article_id}", signature, ex=ttl_sec)
+            for bk in band_keys:
+                key = f"scraper:lsh:b:{bk}"
+                pipe.sadd(key, article_id)
+                pipe.expire(key, ttl_sec)
+            await pipe.execute()
+    except Exception as e:
+        logger.error("redis.lsh.add.error", article_id=article_id, error=str(e))
+        raise
+
+
+# ---- per-domain fetch outcomes -------------------------------------------------------
+# One hash per domain (`scraper:domain:<domain>`) of outcome counters (ok, empty,
+# blocked, error, headless_ok, headless_fail) plus `ts`, the ms they were last
+# decayed at. Every update first scales all counters by 0.5 ** (elapsed / half-life),
+# so old evidence fades and a domain with no recent traffic drifts back to "unknown".
+
+_DOMAIN_STATS_LUA = """
+local now = tonumber(ARGV[1])
+local ts = tonumber(redis.call('HGET', KEYS[1], 'ts') or ARGV[1])
+local factor = 1
+if now > ts then factor = math.pow(0.5, (now - ts) / tonumber(ARGV[2])) end
+local counts = {}
+local flat = redis.call('HGETALL', KEYS[1])
+for i = 1, #flat, 2 do
+  if flat[i] ~= 'ts' then counts[flat[i]] = tonumber(flat[i + 1]) * factor end
+end
+for i = 4, #ARGV do counts[ARGV[i]] = (counts[ARGV[i]] or 0) + 1 end
+local args = {'ts', now}
+for k, v in pairs(counts) do
+  table.insert(args, k)
+  table.insert(args, string.format('%.4f', v))
+end
+redis.call('HSET', KEYS[1], unpack(args))
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[3]))
+return 1
+"""
+
+
+def _domain_key(domain: str) -> str:
+    return f"scraper:domain:{domain}"
+
+
+async def aget_domain_stats(domain: str, half_life_s: float) -> Dict[str, float]:
+    """Outcome counters for `domain`, decayed to now; {} when nothing is recorded."""
+    key = _domain_key(domain)
+    try:
+        raw = await aclient().hgetall(key)
+    except Exception as e:
+        logger.error("redis.domain_stats.get.error", domain=domain, key=key, error=str(e))
+        raise
+    if not raw:
+        return {}
+    age_ms = max(0.0, time.time() * 1000 - float(raw.pop("ts", 0) or 0))
+    factor = 0.5 ** (age_ms / (half_life_s * 1000))
+    return {k: float(v) * factor for k, v in raw.items()}
+
+
+async def arecord_domain_outcomes(domain: str, outcomes: List[str], half_life_s: float) -> None:
+    key = _domain_key(domain)
+    # by then every counter has halved at least eight times
+    ttl = max(1, int(half_life_s * 8))
+    try:
+        script = aclient().register_script(_DOMAIN_STATS_LUA)
+        await script(keys=[key], args=[int(time.time() * 1000), half_life_s * 1000, ttl, *outcomes])
+    except Exception as e:
+        logger.error("redis.domain_stats.record.error", domain=domain, key=key, error=str(e))
+        raise
+
+
+# ---- per-domain circuit breaker ------------------------------------------------------
+# `scraper:circuit:<domain>` holds state (closed / open / half_open), the consecutive
+# failure count, `until` (ms: end of the open cool-down, or of the half-open probe's
+# grant) and the current cool-down length. Domains that are not closed are also
+# indexed in `scraper:circuit:tripped` (ZSET domain -> until) for metrics.
+
+CIRCUIT_TRIPPED_KEY = "scraper:circuit:tripped"
+
+# -> {verdict, failures, until}; verdict is closed, probe (caller is the half-open
+# probe), or open / half_open (caller must stay away until `until`)
+_CIRCUIT_ADMIT_LUA = """
+local state = redis.call('HGET', KEYS[1], 'state')
+if not state or state == 'closed' then
+  return {'closed', tonumber(redis.call('HGET', KEYS[1], 'failures') or '0'), 0}
+end
+local now = tonumber(ARGV[1])
+local until_ms = tonumber(redis.call('HGET', KEYS[1], 'until') or '0')
+if now < until_ms then
+  return {state, 0, until_ms}
+end
+-- cool-down over, or the last probe's holder never reported back
+until_ms = now + tonumber(ARGV[2])
+redis.call('HSET', KEYS[1], 'state', 'half_open', 'until', until_ms)
+redis.call('ZADD', KEYS[2], until_ms, ARGV[3])
+return {'probe', 0, until_ms}
+"""
+
+# -> the state the circuit moved to, or '' when it did not change
+_CIRCUIT_REPORT_LUA = """
+local state = redis.call('HGET', KEYS[1], 'state') or 'closed'
+local now = tonumber(ARGV[1])
+if ARGV[2] == '1' then
+  if state == 'open' then
+    return ''  -- a straggler that started before it tripped; only the probe may close it
+  end
+  redis.call('DEL', KEYS[1])  -- closed: clears the failure streak
+  if state == 'closed' then return '' end
+  redis.call('ZREM', KEYS[2], ARGV[6])
+  return 'closed'
+end
+local cooldown = tonumber(ARGV[4])
+if state == 'closed' then
+  local n = redis.call('HINCRBY', KEYS[1], 'failures', 1)
+  redis.call('EXPIRE', KEYS[1], tonumber(ARGV[7]))
+  if n < tonumber(ARGV[3]) then return '' end
+elseif state == 'half_open' then
+  cooldown = math.min(tonumber(ARGV[5]), 2 * tonumber(redis.call('HGET', KEYS[1], 'cooldown') or ARGV[4]))
+else
+  return ''  -- already open; a straggler that started before it tripped
+end
+local until_ms = now + cooldown
+redis.call('HSET', KEYS[1], 'state', 'open', 'until', until_ms, 'cooldown', cooldown, 'failures', 0)
+redis.call('PEXPIRE', KEYS[1], cooldown + tonumber(ARGV[7]) * 1000)
+redis.call('ZADD', KEYS[2], until_ms, ARGV[6])
+return 'open'
+"""
+
+
+def _circuit_key(domain: str) -> str:
+    return f"scraper:circuit:{domain}"
+
+
+async def acircuit_admit(domain: str, probe_ttl_ms: int) -> Tuple[str, int, int]:
+    """(verdict, failures, until_ms) for a job about to fetch from `domain`."""
+    key = _circuit_key(domain)
+    try:
+        script = aclient().register_script(_CIRCUIT_ADMIT_LUA)
+        verdict, failures, until_ms = await script(keys=[key, CIRCUIT_TRIPPED_KEY],
+                                                   args=[int(time.time() * 1000), probe_ttl_ms, domain])
+    except Exception as e:
+        logger.error("redis.circuit.admit.error", domain=domain, key=key, error=str(e))
+        raise
+    return verdict, int(failures), int(until_ms)
+
+
+async def acircuit_report(domain: str, ok: bool, threshold: int, open_ms: int, max_open_ms: int,
+                          window_s: int) -> str:
+    """Record a fetch success or failure; returns the state the circuit moved to, or ''."""
+    key = _circuit_key(domain)
+    try:
+        script = aclient().register_script(_CIRCUIT_REPORT_LUA)
+        return await script(keys=[key, CIRCUIT_TRIPPED_KEY],
+                            args=[int(time.time() * 1000), 1 if ok else 0, threshold, open_ms, max_open_ms,
+                                  domain, window_s])
+    except Exception as e:
+        logger.error("redis.circuit.report.error", domain=domain, key=key, error=str(e))
+        raise
+
+
+def circuit_states(limit: int = 200) -> Dict[str, str]:
+    """domain -> state for every domain whose circuit is not closed (sync; for metrics)."""
+    r = client()
+    domains = r.zrange(CIRCUIT_TRIPPED_KEY, 0, limit - 1)
+    if not domains:
+        return {}
+    pipe = r.pipeline(transaction=False)
+    for d in domains:
+        pipe.hget(_circuit_key(d), "state")
+    states = dict(zip(domains, pipe.execute()))
+    gone = [d for d, s in states.items() if not s or s == "closed"]
+    if gone:
+        r.zrem(CIRCUIT_TRIPPED_KEY, *gone)  # hash expired without ever closing
+    return {d: s for d, s in states.items() if d not in gone}
+
+
+# ---- leased consumption --------------------------------------------------------------
+# With LEASE_QUEUES on, a pop moves items into a per-consumer processing list
+# (`<queue>:processing:<consumer>`) instead of deleting them, in the same script.
+# Each consumer holds a lease in `<queue>:leases` (ZSET consumer -> deadline ms)
+# that its heartbeat renews. An item leaves the processing list (ack) once its
+# job reached a terminal state: done, parked for retry or sent to the DLQ. Any
+# worker's reaper moves the processing list of a consumer whose lease expired
+# back to the head of the queue, so a killed pod's jobs are redelivered.
+
+_consumer_id: Optional[str] = None
+
+
+def consumer_id() -> str:
+    """Stable id of this process as a queue consumer."""
+    global _consumer_id
+    if _consumer_id is None:
+        _consumer_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+    return _consumer_id
+
+
+def processing_key(queue: str, consumer: str) -> str:
+    return f"{queue}:processing:{consumer}"
+
+
+def leases_key(queue: str) -> str:
+    return f"{queue}:leases"
+
+
+# KEYS: (queue, processing, leases) per queue in priority order.
+# ARGV: count, consumer, lease deadline (ms). Returns [queue, raw, queue, raw, ...].
+_LEASE_POP_LUA = """
+local want = tonumber(ARGV[1])
+local out = {}
+for i = 1, #KEYS, 3 do
+  redis.call('ZADD', KEYS[i + 2], ARGV[3], ARGV[2])
+  if want > 0 then
+    local items = redis.call('LRANGE', KEYS[i], 0, want - 1)
+    if #items > 0 then
+      redis.call('LTRIM', KEYS[i], #items, -1)
+      redis.call('RPUSH', KEYS[i + 1], unpack(items))
+      for _, v in ipairs(items) do
+        out[#out + 1] = KEYS[i]
+        out[#out + 1] = v
+      end
+      want = want - #items
+    end
+  end
+end
+return out
+"""
+
+# KEYS: leases, queue. ARGV: now (ms), processing-key prefix, limit, [consumer].
+# Requeues the processing lists of expired consumers (or just ARGV[4]), oldest
+# item first, at the head of the queue. Processing keys are derived from the
+# prefix, so this needs a single Redis instance (as the other scripts here).
+_REAP_LUA = """
+local who
+if ARGV[4] then
+  who = {ARGV[4]}
+else
+  who = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[3]))
+end
+local moved = 0
+for _, c in ipairs(who) do
+  local p = ARGV[2] .. c
+  while redis.call('RPOPLPUSH', p, KEYS[2]) do
+    moved = moved + 1
+  end
+  redis.call('ZREM', KEYS[1], c)
+end
+return moved
+"""
+REAP_BATCH = 20
+
+
+def _deadline_ms(ttl_sec: float) -> int:
+    return int((time.time() + ttl_sec) * 1000)
+
+
+def _lease_keys(queues: List[str], consumer: str) -> List[str]:
+    keys: List[str] = []
+    for q in queues:
+        keys += [q, processing_key(q, consumer), leases_key(q)]
+    return keys
+
+
+async def alease_pop(queues: List[str], count: int, timeout: int, ttl_sec: float
+                     ) -> List[Tuple[str, str, Dict[str, Any]]]:
+    """Like abatch_pop, but items stay in this consumer's processing list until aack().
+
+    Returns (queue, raw item, parsed job). Blocks up to `timeout` seconds on the
+    first queue only when every queue is empty.
+    """
+    r = aclient()
+    me = consumer_id()
+    keys = _lease_keys(queues, me)
+    script = r.register_script(_LEASE_POP_LUA)
+    try:
+        flat = await script(keys=keys, args=[count, me, _deadline_ms(ttl_sec)])
+        if not flat:
+            # BLMOVE keeps the blocking pop atomic with the move (Redis >= 6.2)
+            raw = await r.blmove(queues[0], processing_key(queues[0], me), timeout, "LEFT", "RIGHT")
+            if raw is None:
+                logger.debug("redis.lease_pop.timeout", queues=queues)
+                return []
+            flat = [queues[0], raw]
+            if count > 1:
+                flat += await script(keys=keys, args=[count - 1, me, _deadline_ms(ttl_sec)])
+    except Exception as e:
+        logger.error("redis.lease_pop.error", queues=queues, error=str(e))
+        raise
+    return [(flat[i], flat[i + 1], _parse_item(flat[i], flat[i + 1])) for i in range(0, len(flat), 2)]
+
+
+async def aack(queue: str, raw: str) -> None:
+    """Drop a leased item from this consumer's processing list."""
+    try:
+        await aclient().lrem(processing_key(queue, consumer_id()), 1, raw)
+    except Exception as e:
+        # stays leased; redelivered if this consumer dies, which is the safe side
+        logger.error("redis.lease.ack.error", queue=queue, error=str(e))
+
+
+# KEYS: processing, queue. ARGV: raw item. Moves one leased item to the back of
+# its queue in one step, so it is never in neither list nor in both.
+_REQUEUE_LEASED_LUA = """
+if redis.call('LREM', KEYS[1], 1, ARGV[1]) > 0 then
+  redis.call('RPUSH', KEYS[2], ARGV[1])
+  return 1
+end
+return 0
+"""
+
+
+async def arequeue_leased(queue: str, raw: str) -> bool:
+    """Give one leased item back to the tail of its queue (processing failed unexpectedly)."""
+    try:
+        script = aclient().register_script(_REQUEUE_LEASED_LUA)
+        return bool(await script(keys=[processing_key(queue, consumer_id()), queue], args=[raw]))
+    except Exception as e:
+        # stays leased: released on shutdown, or reaped if this consumer dies
+        logger.error("redis.lease.requeue.error", queue=queue, error=str(e))
+        return False
+
+
+async def arenew_lease(queues: List[str], ttl_sec: float) -> None:
+    deadline = _deadline_ms(ttl_sec)
+    async with aclient().pipeline(transaction=False) as pipe:
+        for q in queues:
+            pipe.zadd(leases_key(q), {consumer_id(): deadline})
+        await pipe.execute()
+
+
+async def areap_expired(queues: List[str]) -> int:
+    """Requeue the processing lists of consumers whose lease expired."""
+    script = aclient().register_script(_REAP_LUA)
+    moved = 0
+    for q in queues:
+        n = int(await script(keys=[leases_key(q), q],
+                             args=[int(time.time() * 1000), processing_key(q, ""), REAP_BATCH]))
+        if n:
+            logger.warn("redis.lease.reaped", queue=q, count=n)
+        moved += n
+    return moved
+
+
+async def arelease_leases(queues: List[str]) -> int:
+    """Hand everything this consumer still holds back to its queues (clean shutdown)."""
+    script = aclient().register_script(_REAP_LUA)
+    moved = 0
+    for q in queues:
+        moved += int(await script(keys=[leases_key(q), q],
+                                  args=[int(time.time() * 1000), processing_key(q, ""), REAP_BATCH, consumer_id()]))
+    if moved:
+        logger.info("redis.lease.released", queues=queues, count=moved)
+    return moved
@@ -0,0 +1,235 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from .logging import logger
+
+
+_MAX_TRACKED_HOSTS = 4096
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens/sec refill, at most `burst` banked."""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = max(0.001, float(rate))
+        self.burst = max(1.0, float(burst))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, now: float) -> bool:
+        self._refill(now)
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+    def wait_time(self, now: float) -> float:
+        self._refill(now)
+        return 0.0 if self.tokens >= 1.0 else (1.0 - self.tokens) / self.rate
+
+    def drain(self) -> None:
+        self.tokens = 0.0
+
+
+class _Host:
+    __slots__ = ("name", "pending", "overflow", "bucket", "inflight", "blocked_until", "strikes", "last_penalty")
+
+    def __init__(self, name: str, bucket: TokenBucket) -> None:
+        self.name = name
+        self.pending: Deque[Dict[str, Any]] = deque()
+        self.overflow: Deque[Dict[str, Any]] = deque()  # beyond max_pending_per_host
+        self.bucket = bucket
+        self.inflight = 0
+        self.blocked_until = 0.0
+        self.strikes = 0
+        self.last_penalty = 0.0
+
+
+class HostScheduler:
+    """Host-fair dispatch of pending jobs.
+
+    Jobs are grouped by registrable domain; get() walks the hosts round-robin and
+    hands out the first job whose host has a token, a free concurrency slot and no
+    active cool-down, so one slow or rate-limited domain never blocks the others.
+
+    A host's jobs beyond `max_pending_per_host` wait in its overflow, outside the
+    round-robin and the `max_pending` count, and move up as the host dispatches.
+    Overflow is capped at `max_pending` jobs in total; past that put() waits, so a
+    backlog for a few saturated hosts stops the feeder instead of being pushed
+    back to Redis and popped again.
+    """
+
+    def __init__(self, rate_per_sec: float = 1.0, burst: float = 2.0, max_per_host: int = 2,
+                 max_pending: int = 100, max_pending_per_host: int = 20,
+                 penalty_base_s: float = 30.0, penalty_max_s: float = 600.0) -> None:
+        self.rate_per_sec = rate_per_sec
+        self.burst = burst
+        self.max_per_host = max(1, int(max_per_host))
+        self.max_pending = max(1, int(max_pending))
+        self.max_pending_per_host = max(1, int(max_pending_per_host))
+        self.penalty_base_s = penalty_base_s
+        self.penalty_max_s = penalty_max_s
+        self._hosts: Dict[str, _Host] = {}
+        self._ring: Deque[str] = deque()   # hosts that currently have pending jobs
+        self._pending = 0
+        self._overflow = 0
+        self._cond = asyncio.Condition()
+
+    # ---- producer side -------------------------------------------------------------
+
+    def room(self) -> int:
+        """Jobs that can be put() right now without waiting on the global limit."""
+        return max(0, self.max_pending - self._pending)
+
+    def _host_full(self, domain: str) -> bool:
+        h = self._hosts.get(domain)
+        return h is not None and (len(h.pending) >= self.max_pending_per_host or bool(h.overflow))
+
+    def _accepts(self, domain: str) -> bool:
+        if self._host_full(domain):
+            return self._overflow < self.max_pending
+        return self._pending < self.max_pending
+
+    async def put(self, domain: str, job: Dict[str, Any]) -> None:
+        """Queue a job for its host; waits while the limit that applies to it is reached."""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._accepts(domain))
+            if len(self._hosts) >= _MAX_TRACKED_HOSTS:
+                self._prune()
+            h = self._host(domain)
+            if self._host_full(domain):
+                h.overflow.append(job)
+                self._overflow += 1
+                return
+            if not h.pending:
+                self._ring.append(domain)
+            h.pending.append(job)
+            self._pending += 1
+            self._cond.notify_all()
+
+    # ---- consumer side -------------------------------------------------------------
+
+    async def get(self) -> Tuple[str, Dict[str, Any]]:
+        """Next dispatchable (domain, job); caller must call done(domain) afterwards."""
+        async with self._cond:
+            while True:
+                now = time.monotonic()
+                picked, wait_s = self._pick(now)
+                if picked is not None:
+                    self._cond.notify_all()
+                    return picked
+                try:
+                    await asyncio.wait_for(self._cond.wait(), timeout=wait_s)
+                except asyncio.TimeoutError:
+                    pass
+
+    def _pick(self, now: float) -> Tuple[Optional[Tuple[str, Dict[str, Any]]], Optional[float]]:
+        wait_s: Optional[float] = None
+        for _ in range(len(self._ring)):
+            domain = self._ring[0]
+            self._ring.rotate(-1)
+            h = self._hosts[domain]
+            if h.inflight >= self.max_per_host:
+                continue  # woken again by done()
+            if h.blocked_until > now:
+                w = h.blocked_until - now
+            else:
+                w = h.bucket.wait_time(now)
+                if w <= 0 and h.bucket.try_take(now):
+                    job = h.pending.popleft()
+                    self._pending -= 1
+                    h.inflight += 1
+                    if h.overflow:
+                        h.pending.append(h.overflow.popleft())
+                        self._overflow -= 1
+                        self._pending += 1
+                    if not h.pending:
+                        self._ring.remove(domain)
+                    return (domain, job), None
+            wait_s = w if wait_s is None else min(wait_s, w)
+        return None, wait_s
+
+    async def done(self, domain: str) -> None:
+        async with self._cond:
+            h = self._hosts.get(domain)
+            if h is not None:
+                h.inflight = max(0, h.inflight - 1)
+            self._cond.notify_all()
+
+    # ---- feedback ------------------------------------------------------------------
+
+    def penalize(self, domain: str, retry_after_s: Optional[float] = None) -> float:
+        """Cool a host down after a 429/503; honors Retry-After, else backs off exponentially."""
+        h = self._host(domain)
+        now = time.monotonic()
+        if now - h.last_penalty > self.penalty_max_s:
+            h.strikes = 0
+        h.strikes += 1
+        h.last_penalty = now
+        cooldown = retry_after_s if retry_after_s else self.penalty_base_s * (2 ** min(h.strikes - 1, 6))
+        cooldown = min(self.penalty_max_s, max(0.0, float(cooldown)))
+        h.blocked_until = max(h.blocked_until, now + cooldown)
+        h.bucket.drain()
+        logger.warn("scheduler.host.penalized", domain=domain, cooldown_s=round(cooldown, 1), strikes=h.strikes)
+        return cooldown
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """Remove and return every job not yet dispatched (used on shutdown)."""
+        jobs: List[Dict[str, Any]] = []
+        for h in self._hosts.values():
+            jobs.extend(h.pending)
+            jobs.extend(h.overflow)
+            h.pending.clear()
+            h.overflow.clear()
+        self._ring.clear()
+        self._pending = 0
+        self._overflow = 0
+        return jobs
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self._pending,
+            "overflow": self._overflow,
+            "hosts": len(self._hosts),
+            "hosts_waiting": len(self._ring),
+            "inflight": sum(h.inflight for h in self._hosts.values()),
+        }
+
+    # ---- internals -----------------------------------------------------------------
+
+    def _host(self, domain: str) -> _Host:
+        h = self._hosts.get(domain)
+        if h is None:
+            h = _Host(domain, TokenBucket(self.rate_per_sec, self.burst))
+            self._hosts[domain] = h
+        return h
+
+    def _prune(self) -> None:
+        # Only drop hosts whose state is back to "fresh": nothing queued or running,
+        # no cool-down and a full bucket, so forgetting them can't lift a limit.
+        now = time.monotonic()
+        for name, h in list(self._hosts.items()):
+            if h.pending or h.inflight or h.blocked_until > now:
+                continue
+            h.bucket.wait_time(now)
+            if h.bucket.tokens >= h.bucket.burst:
+                del self._hosts[name]
+
+
+# Process-wide handle so the pipeline can report throttling back to the scheduler
+_scheduler: HostScheduler | None = None
+
+
+def set_scheduler(s: Optional[HostScheduler]) -> None:
+    global _scheduler
+    _scheduler = s
+
+
+def get_scheduler() -> Optional[HostScheduler]:
+    return _scheduler
@@ -0,0 +1,39 @@
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, List
+
+# Observers get (stage_name, seconds) for every timed pipeline stage. Nothing is
+# registered by default, so timing costs two perf_counter() calls per stage.
+StageObserver = Callable[[str, float], None]
+
+_observers: List[StageObserver] = []
+
+
+def add_stage_observer(fn: StageObserver) -> None:
+    if fn not in _observers:
+        _observers.append(fn)
+
+
+def remove_stage_observer(fn: StageObserver) -> None:
+    try:
+        _observers.remove(fn)
+    except ValueError:
+        pass
+
+
+def record_stage(name: str, seconds: float) -> None:
+    for fn in _observers:
+        try:
+            fn(name, seconds)
+        except Exception:
+            pass  # an observer must never fail a job
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time the block and report it, whether it returns or raises."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - t0)
@@ -0,0 +1,312 @@
+import asyncio
+import os
+import signal
+from typing import Any, Dict, List, Set, Tuple
+
+from .config import load_config, install_reload_handlers
+from .logging import logger
+from .redis_io import (
+    arpush, aclose, apromote_due, anext_due_ms, aschedule_delayed, adone_story_ids,
+    alease_pop, aack, arequeue_leased, arelease_leases,
+)
+from .db import close_pool, close_article_writer
+from .browser_pool import close_browser_pool
+from .extract_pool import get_extract_pool, close_extract_pool
+from .fetcher import close_http_client
+from .fetch_cache import close_fetch_cache
+from .normalize import PSL_SNAPSHOT_VERSION, canonicalize_url
+from .scheduler import HostScheduler, set_scheduler
+from .main import (
+    process_job, _apop_jobs, _decode_redis_item, _lease_heartbeat, _now_ms, _queues, NonRetryable,
+)
+from .metrics import JOBS_IN_FLIGHT, start_metrics_server, stop_metrics_server
+
+
+# ---- job source --------------------------------------------------------------------
+
+# id(job) -> (queue, raw item) for jobs popped under a lease (LEASE_QUEUES); the
+# item stays in this worker's processing list until _ack(job).
+_leases: Dict[int, Tuple[str, str]] = {}
+
+
+async def _pop(cfg, count: int, wait_s: int) -> List[Dict[str, Any]]:
+    if not cfg.lease_queues:
+        return await _apop_jobs(_queues(cfg), count, wait_s)
+    jobs = []
+    for queue, raw, item in await alease_pop(_queues(cfg), count, wait_s, cfg.lease_ttl_s):
+        try:
+            job = _decode_redis_item(item)
+        except NonRetryable as e:
+            logger.error("scraper.queue.bad_item", queue=queue, error=str(e))
+            job = None
+        if not job:
+            await aack(queue, raw)
+            continue
+        _leases[id(job)] = (queue, raw)
+        jobs.append(job)
+    return jobs
+
+
+async def _ack(job: Dict[str, Any]) -> None:
+    """The job reached a terminal state here; release its lease (no-op when unleased)."""
+    lease = _leases.pop(id(job), None)
+    if lease is not None:
+        await aack(*lease)
+
+
+async def _requeue(job: Dict[str, Any]) -> None:
+    """Processing failed unexpectedly (usually Redis): put a leased job back instead of acking it."""
+    lease = _leases.pop(id(job), None)
+    if lease is not None:
+        await arequeue_leased(*lease)
+
+
+async def _hand_back(cfg, job: Dict[str, Any]) -> None:
+    """Put a popped-but-unprocessed job back at the tail of the input queue."""
+    try:
+        await arpush(cfg.input_queue, job)
+    except Exception as e:
+        # a leased job stays in the processing list and is released on shutdown
+        logger.error("scraper.worker.requeue_failed", error=str(e), story_id=(job.get("story") or {}).get("id"))
+        return
+    await _ack(job)
+
+
+async def _next_jobs(cfg, count: int, wait_s: int) -> List[Dict[str, Any]]:
+    """Up to `count` ready jobs in one pop: input queue first, then due retries.
+
+    Blocks up to `wait_s` while both lists are empty, less if a parked retry comes
+    due sooner; anything pushed meanwhile ends the wait at once. Stories that
+    already carry a done-marker are dropped here, checked for the whole batch in
+    one pipeline, so consumers don't repeat the lookup.
+    """
+    await apromote_due(cfg.retry_queue)
+    due_ms = await anext_due_ms(cfg.retry_queue)
+    if due_ms is not None:
+        wait_s = max(1, min(wait_s, int((due_ms - _now_ms()) / 1000) + 1))
+    ready = []
+    for job in await _pop(cfg, count, wait_s):
+        visible_at = job.get("visible_at")
+        if visible_at and visible_at > _now_ms():
+            # pushed straight onto the list by an older worker: park it until due
+            logger.debug("scraper.job_not_visible_yet", visible_at=visible_at, current_time=_now_ms())
+            await aschedule_delayed(cfg.retry_queue, job, visible_at)
+            await _ack(job)
+            continue
+        ready.append(job)
+    if not ready or os.environ.get("FORCE", "false").lower() in ("1", "true", "yes"):
+        return ready
+    done = await adone_story_ids([sid for sid in ((j.get("story") or {}).get("id") for j in ready) if sid])
+    for job in ready:
+        if (job.get("story") or {}).get("id") in done:
+            logger.info("scraper.job.skip_idempotent", trace_id=job.get("trace_id"), story_id=job["story"]["id"])
+            await _ack(job)
+    return [j for j in ready if (j.get("story") or {}).get("id") not in done]
+
+
+def _job_domain(job: Dict[str, Any]) -> str:
+    url = (job.get("story") or {}).get("url")
+    if not url:
+        return ""
+    try:
+        return canonicalize_url(url)[1]
+    except Exception:
+        return ""
+
+
+# ---- feeder / consumers ------------------------------------------------------------
+
+async def _feeder(cfg, sched: HostScheduler, stop: asyncio.Event) -> None:
+    """Pull batches of jobs off Redis and hand them to the host scheduler until `stop`.
+
+    While the queues stay empty the blocking pop waits longer each time, from
+    DAEMON_IDLE_MIN_S doubling up to DAEMON_IDLE_MAX_S. Stops between pops rather
+    than being cancelled: a BLPOP abandoned mid-wait can still take an item
+    server-side, which would then be lost.
+    """
+    pending: List[Dict[str, Any]] = []
+    idle_s = cfg.daemon_idle_min_s
+    try:
+        while not stop.is_set():
+            cfg = load_config()  # cheap snapshot; picks up reloaded batch size / queues
+            try:
+                if not pending:
+                    count = max(1, min(cfg.redis_batch_size, sched.room()))
+                    pending = await _next_jobs(cfg, count, idle_s)
+                    if stop.is_set():
+                        break  # requeued below
+                if not pending:
+                    idle_s = min(cfg.daemon_idle_max_s, idle_s * 2)
+                    logger.debug("scraper.loop.no_job_available", next_wait_s=idle_s)
+                    # nothing ready (or only not-yet-visible retries): don't spin on Redis
+                    await asyncio.sleep(0.5)
+                    continue
+                idle_s = cfg.daemon_idle_min_s
+                while pending:
+                    # a saturated host's jobs wait in its overflow; put() blocks once that is full
+                    await sched.put(_job_domain(pending[0]), pending[0])
+                    pending.pop(0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("scraper.feeder.error", error=str(e))
+                await asyncio.sleep(0.5)
+    finally:
+        # popped but not yet scheduled: hand them back
+        for job in pending:
+            await _hand_back(cfg, job)
+
+
+def _concurrency() -> int:
+    return max(1, int(load_config().worker_concurrency or 1))
+
+
+async def _consumer(slot: int, sched: HostScheduler, stats: Dict[str, int], idle: Set[int],
+                    stop: asyncio.Event) -> None:
+    """One in-flight job at a time; worker_concurrency of these run side by side.
+
+    A slot at or above the (reloadable) worker_concurrency retires after its job,
+    and so does every slot once `stop` is set.
+    """
+    while slot < _concurrency() and not stop.is_set():
+        idle.add(slot)
+        try:
+            domain, job = await sched.get()
+        finally:
+            idle.discard(slot)
+        # the lease is acked only once the job reached a terminal state (done, retry
+        # scheduled, DLQ written, or unprocessable); when cancelled mid-job it stays
+        # leased and is released on shutdown
+        try:
+            with JOBS_IN_FLIGHT.track():
+                ok = await process_job(job, idempotency_checked=True)
+            await _ack(job)
+            if ok:
+                stats["processed"] += 1
+                logger.info("scraper.loop.successful_processing", slot=slot, domain=domain,
+                            processed_count=stats["processed"])
+        except asyncio.CancelledError:
+            raise
+        except NonRetryable as e:
+            logger.error("scraper.loop.nonretryable", slot=slot, error=str(e))
+            await _ack(job)
+        except Exception as e:
+            logger.error("scraper.loop.error", slot=slot, error=str(e), processed_count=stats["processed"])
+            await _requeue(job)
+            await asyncio.sleep(0.5)
+        finally:
+            await sched.done(domain)
+
+
+async def _resize_consumers(consumers: Dict[int, "asyncio.Task[None]"], sched: HostScheduler,
+                            stats: Dict[str, int], idle: Set[int], stop: asyncio.Event) -> None:
+    """Follow worker_concurrency across config reloads without restarting the worker."""
+    while True:
+        await asyncio.sleep(1.0)
+        target = _concurrency()
+        for slot, task in list(consumers.items()):
+            if task.done():
+                del consumers[slot]
+            elif slot >= target and slot in idle:
+                task.cancel()  # waiting in sched.get(): nothing taken yet
+        for slot in range(target):
+            if slot not in consumers:
+                consumers[slot] = asyncio.create_task(_consumer(slot, sched, stats, idle, stop))
+                logger.info("scraper.worker.consumer_started", slot=slot, concurrency=target)
+
+
+async def worker_main() -> None:
+    install_reload_handlers()
+    cfg = load_config()
+    concurrency = _concurrency()
+    sched = HostScheduler(
+        rate_per_sec=cfg.host_rate_per_sec,
+        burst=cfg.host_burst,
+        max_per_host=cfg.host_max_concurrency,
+        max_pending=cfg.scheduler_max_pending,
+        max_pending_per_host=cfg.scheduler_max_pending_per_host,
+    )
+    set_scheduler(sched)
+    logger.info(
+        "scraper.worker.start",
+        queues={"in": cfg.input_queue, "out": cfg.summarizer_queue, "retry": cfg.retry_queue, "dlq": cfg.dlq},
+        concurrency=concurrency,
+        max_retries=cfg.max_retries,
+        headless_enabled=cfg.headless_enabled,
+        host_rate_per_sec=cfg.host_rate_per_sec,
+        host_max_concurrency=cfg.host_max_concurrency,
+        psl_snapshot=PSL_SNAPSHOT_VERSION,
+    )
+
+    start_metrics_server(cfg.metrics_port)
+    # spawn + warm the extraction workers before taking jobs
+    await get_extract_pool().start()
+
+    # SIGTERM/SIGINT: stop taking jobs, let the ones in flight finish (up to
+    # drain_timeout_s), then hand everything still queued locally back to Redis
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    stats = {"processed": 0}
+    idle: Set[int] = set()
+    consumers = {i: asyncio.create_task(_consumer(i, sched, stats, idle, stop)) for i in range(concurrency)}
+    feeder = asyncio.create_task(_feeder(cfg, sched, stop))
+    tasks = [feeder, asyncio.create_task(_resize_consumers(consumers, sched, stats, idle, stop))]
+    # the lease heartbeat outlives the drain; it is stopped right before the release
+    heartbeat = asyncio.create_task(_lease_heartbeat(cfg)) if cfg.lease_queues else None
+    try:
+        await stop.wait()
+        logger.info("scraper.worker.draining", in_flight=len(consumers) - len(idle))
+        # the feeder notices `stop` once its current pop returns (<= DAEMON_IDLE_MAX_S)
+        # and requeues whatever it popped but hadn't scheduled; it is only cancelled
+        # if stuck in put()
+        await asyncio.wait([feeder], timeout=load_config().daemon_idle_max_s + 2)
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for slot in list(idle):
+            consumers[slot].cancel()
+        busy = [t for t in consumers.values() if not t.done()]
+        if busy:
+            _done, late = await asyncio.wait(busy, timeout=load_config().drain_timeout_s)
+            if late:
+                logger.warn("scraper.worker.drain_timeout", abandoned=len(late))
+    finally:
+        tasks += list(consumers.values())
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        set_scheduler(None)
+        # jobs still parked in the scheduler were already popped from Redis: hand them back
+        for job in sched.drain():
+            await _hand_back(cfg, job)
+        if heartbeat is not None:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+            try:
+                # whatever is still leased (jobs abandoned at the drain timeout) goes back first in line
+                await arelease_leases(_queues(cfg))
+            except Exception as e:
+                logger.error("scraper.lease.release_error", error=str(e))
+            _leases.clear()
+        await close_article_writer()
+        await close_http_client()
+        await close_browser_pool()
+        await aclose()
+        try:
+            await asyncio.to_thread(close_pool)
+        except Exception:
+            pass
+        await asyncio.to_thread(close_extract_pool)
+        close_fetch_cache()
+        stop_metrics_server()
+        logger.info("scraper.worker.stopped", processed_count=stats["processed"])
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(worker_main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,14 @@
+"""language_sample must spread over trafilatura output, which uses single newlines."""
+from app.normalize import LANG_SAMPLE_CHARS, language_sample
+
+
+def test_sample_spans_single_newline_paragraphs():
+    paras = [f"Paragraph {i:02d} " + "lorem ipsum dolor sit amet " * 4 for i in range(60)]
+    text = "\n".join(paras)
+
+    sample = language_sample(text)
+
+    assert len(sample) <= LANG_SAMPLE_CHARS
+    assert sample != text[:LANG_SAMPLE_CHARS]
+    assert "Paragraph 00" in sample
+    assert "Paragraph 59" in sample
@@ -0,0 +1,10 @@
+"""The scraper and summarizer ship byte-identical copies of app/logging.py."""
+from pathlib import Path
+
+SERVICES = Path(__file__).resolve().parents[2]
+
+
+def test_logging_copies_match():
+    scraper = (SERVICES / "scraper-py" / "app" / "logging.py").read_bytes()
+    summarizer = (SERVICES / "summarizer-py" / "app" / "logging.py").read_bytes()
+    assert scraper == summarizer, "edit services/*/app/logging.py together"
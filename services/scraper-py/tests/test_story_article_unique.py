@@ -0,0 +1,167 @@
+"""Repost and near-duplicate writes against the real story_article_unique index.
+
+Needs a scratch Postgres database (its story/article tables are dropped and
+recreated): PG_TEST_DSN=postgresql://... python -m pytest tests
+Skipped when PG_TEST_DSN is not set.
+"""
+import os
+import uuid
+from pathlib import Path
+
+import pytest
+
+PG_TEST_DSN = os.environ.get("PG_TEST_DSN")
+pytestmark = pytest.mark.skipif(not PG_TEST_DSN, reason="PG_TEST_DSN not set")
+
+SQL_DIR = Path(__file__).resolve().parents[3] / "infra" / "sql"
+
+# the parts of 001_init.sql these paths touch (001 also needs pgvector)
+_BASE_SCHEMA = """
+DROP VIEW IF EXISTS story_list;
+DROP TABLE IF EXISTS story_duplicate, rank_signals, story, article CASCADE;
+CREATE TABLE article (
+  id            uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+  language      text NOT NULL DEFAULT 'en',
+  html          text,
+  text          text NOT NULL,
+  word_count    int  NOT NULL,
+  content_hash  text NOT NULL,
+  CONSTRAINT article_content_hash_unique UNIQUE (content_hash)
+);
+CREATE TABLE story (
+  id          uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+  title       text NOT NULL DEFAULT '',
+  source      text NOT NULL DEFAULT 'hn',
+  hn_id       int,
+  url         text,
+  domain      text,
+  author      text,
+  points      int,
+  comments_count int,
+  created_at  timestamptz NOT NULL DEFAULT now(),
+  fetched_at  timestamptz NOT NULL DEFAULT now(),
+  article_id  uuid NULL REFERENCES article(id) ON DELETE SET NULL
+);
+CREATE TABLE rank_signals (
+  story_id  uuid PRIMARY KEY REFERENCES story(id) ON DELETE CASCADE,
+  hot_score double precision NOT NULL DEFAULT 0
+);
+CREATE UNIQUE INDEX story_article_unique ON story(article_id) WHERE article_id IS NOT NULL;
+"""
+
+
+@pytest.fixture(scope="module")
+def scraper():
+    os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+    os.environ["PG_DSN"] = PG_TEST_DSN
+    import psycopg
+    from app import db, main
+
+    with psycopg.connect(PG_TEST_DSN, autocommit=True) as conn:
+        conn.execute(_BASE_SCHEMA)
+        conn.execute((SQL_DIR / "005_story_duplicate.sql").read_text())
+    yield main, db
+    db.close_pool()
+
+
+def _story() -> str:
+    story_id = str(uuid.uuid4())
+    from app.db import transaction
+    with transaction() as conn:
+        conn.execute("INSERT INTO story(id, title) VALUES (%s, 't')", (story_id,))
+    return story_id
+
+
+def _row(sql: str, *params):
+    from app.db import transaction
+    with transaction() as conn:
+        return conn.execute(sql, params).fetchone()
+
+
+def _article_row(db, story_id: str, text: str, content_hash: str = ""):
+    return db.ArticleRow("en", text, len(text.split()), content_hash or uuid.uuid4().hex, story_id,
+                         "example.com", None)
+
+
+def _article(db, story_id: str, text: str) -> str:
+    return db._write_row(_article_row(db, story_id, text))
+
+
+def test_constraint_is_live(scraper):
+    main, db = scraper
+    first, second = _story(), _story()
+    article_id = _article(db, first, "original text")
+    with pytest.raises(Exception, match="story_article_unique"):
+        with db.transaction() as conn:
+            db.link_story_tx(conn, second, article_id, domain=None, author=None)
+
+
+def test_batch_with_one_hash_twice_links_the_first_story(scraper):
+    main, db = scraper
+    first, second = _story(), _story()
+    content_hash = uuid.uuid4().hex
+    ids = db._write_rows([_article_row(db, first, "same text", content_hash),
+                          _article_row(db, second, "same text", content_hash)])
+
+    article_id = ids[content_hash]
+    assert isinstance(article_id, str)
+    assert str(_row("SELECT article_id FROM story WHERE id = %s", first)[0]) == article_id
+    assert _row("SELECT article_id FROM story WHERE id = %s", second)[0] is None
+    assert _row("SELECT via FROM story_duplicate WHERE story_id = %s", second) == ("repost",)
+
+
+def test_batch_row_for_an_owned_article_is_a_repost(scraper):
+    main, db = scraper
+    owner, late = _story(), _story()
+    content_hash = uuid.uuid4().hex
+    article_id = db._write_row(_article_row(db, owner, "owned text", content_hash))
+    assert isinstance(article_id, str)
+
+    assert db._write_row(_article_row(db, late, "owned text", content_hash)) == article_id
+    assert _row("SELECT via FROM story_duplicate WHERE story_id = %s", late) == ("repost",)
+    # the owner's own redelivery stays a plain link
+    assert db._write_rows([_article_row(db, owner, "owned text", content_hash)]) == {content_hash: article_id}
+    assert _row("SELECT count(*) FROM story_duplicate WHERE story_id = %s", owner) == (0,)
+
+
+def test_repost_of_linked_article_is_recorded_not_linked(scraper):
+    main, db = scraper
+    first, repost = _story(), _story()
+    article_id = _article(db, first, "some article text")
+
+    assert main._link_existing_article(article_id, repost, "example.com", "alice") == ("en", "some article text")
+
+    assert _row("SELECT article_id FROM story WHERE id = %s", repost)[0] is None
+    assert _row("SELECT article_id, via FROM story_duplicate WHERE story_id = %s", repost) == (
+        uuid.UUID(article_id), "repost")
+    # the feed view resolves the repost to the shared article
+    assert str(_row("SELECT article_id FROM story_list WHERE id = %s", repost)[0]) == article_id
+    assert _row("SELECT domain, author FROM story WHERE id = %s", repost) == ("example.com", "alice")
+
+
+def test_repost_of_unlinked_article_links_it(scraper):
+    main, db = scraper
+    owner, repost = _story(), _story()
+    article_id = _article(db, owner, "orphaned text")
+    _row("UPDATE story SET article_id = NULL WHERE id = %s RETURNING id", owner)
+
+    assert main._link_existing_article(article_id, repost, "example.com", None) is not None
+    assert str(_row("SELECT article_id FROM story WHERE id = %s", repost)[0]) == article_id
+    # redelivery of the owning story's own job is a no-op link
+    assert main._link_existing_article(article_id, repost, "example.com", None) is not None
+
+
+def test_near_duplicate_resolves_to_the_existing_article(scraper):
+    main, db = scraper
+    first, near = _story(), _story()
+    original = _article(db, first, "the syndicated story text")
+    articles = _row("SELECT count(*) FROM article")[0]
+
+    assert main._link_existing_article(original, near, "example.com", None, via="near_dup", score=0.91) == (
+        "en", "the syndicated story text")
+
+    assert _row("SELECT count(*) FROM article")[0] == articles
+    assert _row("SELECT article_id FROM story WHERE id = %s", near)[0] is None
+    assert str(_row("SELECT article_id FROM story_list WHERE id = %s", near)[0]) == original
+    via, similarity = _row("SELECT via, similarity FROM story_duplicate WHERE story_id = %s", near)
+    assert via == "near_dup" and similarity == pytest.approx(0.91)
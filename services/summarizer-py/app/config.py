@@ -26,6 +26,8 @@ class Config:
     # Behavior
     MAX_RETRIES: int = int(os.environ.get("MAX_RETRIES", "3"))
     VISIBILITY_TIMEOUT_SEC: int = int(os.environ.get("VISIBILITY_TIMEOUT", "120").rstrip("s"))
+    # lease-based reads: in-flight jobs survive a killed worker (lease = VISIBILITY_TIMEOUT)
+    LEASE_QUEUES: bool = os.environ.get("LEASE_QUEUES", "false").lower() in ("1", "true", "yes")
     JSON_SCHEMA_VERSION: int = int(os.environ.get("JSON_SCHEMA_VERSION", "1"))
     EMBEDDINGS_ENABLED: bool = os.environ.get("EMBEDDINGS_ENABLED", "false").lower() in ("1", "true", "yes")
 
@@ -1,16 +1,32 @@
+# Shared verbatim by services/scraper-py and services/summarizer-py (app/logging.py).
+# Each service's image is built from its own directory, so the two cannot import
+# one module; edit both copies together (tests/test_logging_copies.py checks).
+import atexit
 import json
 import sys
+import threading
 import time
-from typing import Any, Dict, Iterable
+from typing import Any, Dict, Iterable, List, Optional
 import os
 import uuid
 import base64
 from datetime import datetime, date
 from decimal import Decimal
 
+try:
+    import orjson
+    _HAS_ORJSON = True
+except ImportError:  # stdlib json fallback; same output, just slower
+    _HAS_ORJSON = False
+
 LEVELS = {"debug": 10, "info": 20, "warn": 30, "warning": 30, "error": 40}
 _REDACT_KEYS = {"api_key", "authorization", "password", "secret", "token", "access_token", "refresh_token"}
 
+# Lines are buffered and written in one go every FLUSH_INTERVAL_S, when the buffer
+# passes FLUSH_BYTES, or immediately for errors. LOG_FLUSH_INTERVAL_MS=0 writes through.
+FLUSH_INTERVAL_S = float(os.environ.get("LOG_FLUSH_INTERVAL_MS", "200")) / 1000.0
+FLUSH_BYTES = 64 * 1024
+
 def _safe_default(o: Any) -> Any:
     """Fallback serializer for non-JSON-serializable types."""
     if isinstance(o, uuid.UUID):
@@ -32,8 +48,26 @@ def _safe_default(o: Any) -> Any:
     # as a last resort
     return str(o)
 
+def _needs_scrub(obj: Any, redact_keys: Iterable[str]) -> bool:
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            if isinstance(k, str) and k.lower() in redact_keys:
+                return True
+            if isinstance(v, (dict, list, tuple)) and _needs_scrub(v, redact_keys):
+                return True
+        return False
+    if isinstance(obj, (list, tuple)):
+        return any(isinstance(v, (dict, list, tuple)) and _needs_scrub(v, redact_keys) for v in obj)
+    return False
+
 def _scrub(obj: Any, redact_keys: Iterable[str]) -> Any:
-    """Recursively scrub sensitive fields by key name (case-insensitive)."""
+    """Recursively scrub sensitive fields by key name (case-insensitive).
+
+    Only containers that actually hold a secret-bearing key are copied; everything
+    else is returned as-is.
+    """
+    if not _needs_scrub(obj, redact_keys):
+        return obj
     if isinstance(obj, dict):
         out: Dict[str, Any] = {}
         for k, v in obj.items():
@@ -44,18 +78,68 @@ def _scrub(obj: Any, redact_keys: Iterable[str]) -> Any:
         return out
     if isinstance(obj, list):
         return [_scrub(v, redact_keys) for v in obj]
-    if isinstance(obj, tuple):
-        return tuple(_scrub(v, redact_keys) for v in obj)
-    # primitives / everything else
-    return obj
+    return tuple(_scrub(v, redact_keys) for v in obj)
+
+def _dumps(rec: Dict[str, Any]) -> bytes:
+    if _HAS_ORJSON:
+        try:
+            return orjson.dumps(rec, default=_safe_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+        except TypeError:
+            pass  # e.g. ints beyond 64 bits; stdlib json copes
+    return (json.dumps(rec, default=_safe_default, ensure_ascii=False) + "\n").encode("utf-8")
+
+def _parse_sample_rates(spec: str) -> Dict[str, float]:
+    """LOG_SAMPLE="scraper.fetch.start=0.1,scraper.url.normalized=0.01" -> {event: rate}."""
+    rates: Dict[str, float] = {}
+    for part in (spec or "").split(","):
+        event, _, rate = part.strip().partition("=")
+        try:
+            rates[event] = min(1.0, max(0.0, float(rate)))
+        except ValueError:
+            continue
+    return rates
 
 class JsonLogger:
-    def __init__(self, level: str = "info") -> None:
+    def __init__(self, level: str = "info", sample_rates: Optional[Dict[str, float]] = None,
+                 flush_interval_s: float = FLUSH_INTERVAL_S) -> None:
         self.level = LEVELS.get(level.lower(), 20)
         self._pid = os.getpid()
+        # event -> keep every Nth debug/info line; warn and error are never sampled
+        self._sample_every: Dict[str, int] = {}
+        self._sample_seen: Dict[str, int] = {}
+        for event, rate in (sample_rates or {}).items():
+            self.set_sample_rate(event, rate)
+        self._buf: List[bytes] = []
+        self._buf_bytes = 0
+        self._lock = threading.Lock()
+        self._flush_interval_s = flush_interval_s
+        self._flusher: Optional[threading.Thread] = None
+
+    def enabled(self, level_name: str) -> bool:
+        """Cheap guard for call sites that build expensive fields."""
+        return LEVELS.get(level_name, 20) >= self.level
+
+    def set_sample_rate(self, event: str, rate: float) -> None:
+        if rate >= 1.0:
+            self._sample_every.pop(event, None)
+        else:
+            self._sample_every[event] = int(1 / rate) if rate > 0 else 0
+
+    def _sampled_out(self, event: str) -> bool:
+        every = self._sample_every.get(event)
+        if every is None:
+            return False
+        if every == 0:
+            return True
+        n = self._sample_seen.get(event, 0)
+        self._sample_seen[event] = n + 1
+        return n % every != 0
 
     def _emit(self, level_name: str, event: str, **fields: Any) -> None:
-        if LEVELS.get(level_name, 20) < self.level:
+        level = LEVELS.get(level_name, 20)
+        if level < self.level:
+            return
+        if level < 30 and self._sample_every and self._sampled_out(event):
             return
         rec: Dict[str, Any] = {
             "ts": int(time.time() * 1000),
@@ -63,14 +147,14 @@ class JsonLogger:
             "level": level_name.upper() if level_name != "warning" else "WARN",
             "pid": self._pid,
         }
-        # merge fields then scrub secrets recursively
-        for k, v in fields.items():
-            rec[k] = v
+        if event in self._sample_every:
+            rec["sample_every"] = self._sample_every[event]
+        # merge fields then scrub secrets (copies only what holds a secret key)
+        rec.update(fields)
         rec = _scrub(rec, _REDACT_KEYS)
 
         try:
-            sys.stdout.write(json.dumps(rec, default=_safe_default, ensure_ascii=False) + "\n")
-            sys.stdout.flush()
+            line = _dumps(rec)
         except Exception as e:
             # Last-ditch: never crash the app because logging failed
             fallback = {
@@ -82,13 +166,66 @@ class JsonLogger:
                 "error": str(e),
                 "data_repr": repr(rec),
             }
-            sys.stdout.write(json.dumps(fallback, default=_safe_default, ensure_ascii=False) + "\n")
-            sys.stdout.flush()
+            line = _dumps(fallback)
+        self._write(line, flush_now=level >= 40)
+
+    # ---- output --------------------------------------------------------------------
+
+    def _write(self, line: bytes, flush_now: bool = False) -> None:
+        if self._flush_interval_s <= 0:
+            self._write_out([line])
+            return
+        with self._lock:
+            self._buf.append(line)
+            self._buf_bytes += len(line)
+            full = flush_now or self._buf_bytes >= FLUSH_BYTES
+            if self._flusher is None:
+                self._start_flusher()
+        if full:
+            self.flush()
+
+    def _start_flusher(self) -> None:
+        t = threading.Thread(target=self._flush_loop, name="log-flush", daemon=True)
+        self._flusher = t
+        t.start()
+
+    def _flush_loop(self) -> None:
+        while True:
+            time.sleep(self._flush_interval_s)
+            if self._buf:
+                self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            lines, self._buf, self._buf_bytes = self._buf, [], 0
+            if lines:
+                self._write_out(lines)
+
+    @staticmethod
+    def _write_out(lines: List[bytes]) -> None:
+        data = b"".join(lines)
+        try:
+            out = getattr(sys.stdout, "buffer", None)
+            if out is not None:
+                sys.stdout.flush()  # keep ordering with any print() output
+                out.write(data)
+                out.flush()
+            else:
+                sys.stdout.write(data.decode("utf-8"))
+                sys.stdout.flush()
+        except Exception:
+            pass  # stdout gone (closed pipe at shutdown); nothing sensible to do
+
+    # ---- API -----------------------------------------------------------------------
 
     def debug(self, event: str, **fields: Any) -> None:
+        if self.level > 10:
+            return
         self._emit("debug", event, **fields)
 
     def info(self, event: str, **fields: Any) -> None:
+        if self.level > 20:
+            return
         self._emit("info", event, **fields)
 
     def warn(self, event: str, **fields: Any) -> None:
@@ -101,5 +238,6 @@ class JsonLogger:
     def error(self, event: str, **fields: Any) -> None:
         self._emit("error", event, **fields)
 
-logger = JsonLogger(os.environ.get("LOG_LEVEL", "info"))
-__all__ = ["logger","JsonLogger","_safe_default"]
\ No newline at end of file
+logger = JsonLogger(os.environ.get("LOG_LEVEL", "info"), _parse_sample_rates(os.environ.get("LOG_SAMPLE", "")))
+atexit.register(logger.flush)
+__all__ = ["logger","JsonLogger","_safe_default"]
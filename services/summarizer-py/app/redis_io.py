@@ -2,6 +2,8 @@
 import json
 import os
 import socket
+import time
+import uuid
 from typing import Any, Dict, List, Optional, Tuple, Union
 from .logging import _safe_default
 from redis.asyncio import Redis
@@ -58,8 +60,230 @@ async def to_list(r: Redis, queue: str, payload: Dict[str, Any]) -> int:
         raise
 
 
-async def set_idempotency(r: Redis, article_id: str, model: str, ttl_sec: int = 7 * 24 * 3600) -> bool:
-    """Set idempotency key to prevent duplicate processing."""
-    key = f"summarizer:done:{article_id}:{model}"
-    was_set = await r.set(key, "1", nx=True, ex=ttl_sec)
-    return bool(was_set)
+# Retries wait in a sorted set (`<queue>:delayed`) scored by visible_at in ms.
+# One Lua call moves a batch of due jobs onto the list in due order, so BRPOP
+# readers never see a job before it is ready.
+_PROMOTE_LUA = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+if #due > 0 then
+  redis.call('ZREM', KEYS[1], unpack(due))
+  redis.call('LPUSH', KEYS[2], unpack(due))
+end
+return #due
+"""
+
+
+def delayed_key(queue: str) -> str:
+    return f"{queue}:delayed"
+
+
+async def schedule_retry(r: Redis, queue: str, payload: Dict[str, Any], visible_at_ms: int) -> None:
+    """Park a job until visible_at_ms; promote_due() moves it onto `queue` afterwards."""
+    try:
+        await r.zadd(delayed_key(queue), {json.dumps(payload, default=_safe_default): int(visible_at_ms)})
+        logger.info("redis.schedule_retry.success", queue=queue, visible_at=visible_at_ms)
+    except Exception as e:
+        logger.error("redis.schedule_retry.error", queue=queue, error=str(e))
+        raise
+
+
+async def promote_due(r: Redis, queue: str, limit: int = 100) -> int:
+    """Atomically move due jobs from the delayed set onto `queue`, `limit` per call."""
+    script = r.register_script(_PROMOTE_LUA)
+    moved = 0
+    while True:
+        n = int(await script(keys=[delayed_key(queue), queue], args=[int(time.time() * 1000), limit]))
+        moved += n
+        if n < limit:
+            break
+    if moved:
+        logger.debug("redis.promote_due.moved", queue=queue, count=moved)
+    return moved
+
+
+# Idempotency is claimed, not just set: "pending" (with a visibility-timeout TTL,
+# renewed by the holder for as long as it works on the article) while a worker is
+# on the article, "1" once the summary is out. A failed attempt drops its claim so
+# the retry can run; a crashed one stops renewing and expires.
+_CLAIM_LUA = """
+local v = redis.call('GET', KEYS[1])
+if not v then
+  redis.call('SET', KEYS[1], 'pending', 'EX', tonumber(ARGV[1]))
+  return 'new'
+end
+if v == 'pending' then
+  return 'in_progress'
+end
+return 'done'
+"""
+
+
+_RENEW_CLAIM_LUA = """
+if redis.call('GET', KEYS[1]) == 'pending' then
+  return redis.call('EXPIRE', KEYS[1], tonumber(ARGV[1]))
+end
+return 0
+"""
+
+
+def _done_key(article_id: str, model: str) -> str:
+    return f"summarizer:done:{article_id}:{model}"
+
+
+async def claim_article(r: Redis, article_id: str, model: str, ttl_sec: int) -> str:
+    """'new' (claimed for ttl_sec), 'in_progress' (another worker holds it) or 'done'."""
+    return str(await r.register_script(_CLAIM_LUA)(keys=[_done_key(article_id, model)], args=[int(ttl_sec)]))
+
+
+async def renew_claim(r: Redis, article_id: str, model: str, ttl_sec: int) -> bool:
+    """Push a pending claim's expiry out to ttl_sec; False if it is no longer pending."""
+    return bool(await r.register_script(_RENEW_CLAIM_LUA)(keys=[_done_key(article_id, model)], args=[int(ttl_sec)]))
+
+
+async def mark_done(r: Redis, article_id: str, model: str, ttl_sec: int = 7 * 24 * 3600) -> None:
+    await r.set(_done_key(article_id, model), "1", ex=ttl_sec)
+
+
+async def release_claim(r: Redis, article_id: str, model: str) -> None:
+    key = _done_key(article_id, model)
+    if await r.get(key) == "pending":
+        await r.delete(key)
+
+
+# Leased reads (LEASE_QUEUES): the pop moves the job into this consumer's
+# processing list (`<queue>:processing:<consumer>`) in the same script, and the
+# consumer keeps a lease in `<queue>:leases` (ZSET consumer -> deadline ms)
+# renewed by its heartbeat. ack() removes the job once it reached a terminal
+# state; reap_expired() pushes the processing list of any consumer whose lease
+# lapsed back onto the queue's consuming end.
+
+_consumer_id: Optional[str] = None
+
+
+def consumer_id() -> str:
+    global _consumer_id
+    if _consumer_id is None:
+        _consumer_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+    return _consumer_id
+
+
+def processing_key(queue: str, consumer: str) -> str:
+    return f"{queue}:processing:{consumer}"
+
+
+def leases_key(queue: str) -> str:
+    return f"{queue}:leases"
+
+
+# KEYS: (queue, processing, leases) per queue in priority order.
+# ARGV: consumer, lease deadline (ms). Returns {queue, raw} or nil.
+_LEASE_POP_LUA = """
+for i = 1, #KEYS, 3 do
+  redis.call('ZADD', KEYS[i + 2], ARGV[2], ARGV[1])
+end
+for i = 1, #KEYS, 3 do
+  local v = redis.call('RPOP', KEYS[i])
+  if v then
+    redis.call('LPUSH', KEYS[i + 1], v)
+    return {KEYS[i], v}
+  end
+end
+return nil
+"""
+
+# KEYS: leases, queue. ARGV: now (ms), processing-key prefix, limit, [consumer].
+# Requeued jobs go on the right, the end BRPOP/lease_job read from.
+_REAP_LUA = """
+local who
+if ARGV[4] then
+  who = {ARGV[4]}
+else
+  who = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[3]))
+end
+local moved = 0
+for _, c in ipairs(who) do
+  local p = ARGV[2] .. c
+  local v = redis.call('LPOP', p)
+  while v do
+    redis.call('RPUSH', KEYS[2], v)
+    moved = moved + 1
+    v = redis.call('LPOP', p)
+  end
+  redis.call('ZREM', KEYS[1], c)
+end
+return moved
+"""
+
+
+def _deadline_ms(ttl_sec: float) -> int:
+    return int((time.time() + ttl_sec) * 1000)
+
+
+async def lease_job(r: Redis, queues: List[str], ttl_sec: float,
+                    block_ms: int = 1000) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+    """Leased twin of read_job: (queue, raw, payload), or None on timeout.
+
+    Blocks (BLMOVE, Redis >= 6.2) on the last queue only, which is the input
+    queue here; retries reach their list through promote_due() anyway.
+    """
+    me = consumer_id()
+    keys: List[str] = []
+    for q in queues:
+        keys += [q, processing_key(q, me), leases_key(q)]
+    try:
+        res = await r.register_script(_LEASE_POP_LUA)(keys=keys, args=[me, _deadline_ms(ttl_sec)])
+        if not res:
+            q = queues[-1]
+            raw = await r.blmove(q, processing_key(q, me), block_ms / 1000, "RIGHT", "LEFT")
+            if raw is None:
+                logger.debug("redis.lease_job.no_messages", queues=queues)
+                return None
+            res = [q, raw]
+    except Exception as e:
+        logger.error("redis.lease_job.error", queues=queues, error=str(e))
+        raise
+    queue_name, message_data = res
+    logger.info("redis.read_job.message_received", queue=queue_name, leased=True)
+    try:
+        return queue_name, message_data, json.loads(message_data)
+    except Exception as e:
+        logger.warn("redis.payload_parse_failed", queue=queue_name, error=str(e))
+        return queue_name, message_data, {}
+
+
+async def ack(r: Redis, queue: str, raw: str) -> None:
+    try:
+        await r.lrem(processing_key(queue, consumer_id()), 1, raw)
+    except Exception as e:
+        # left leased: redelivered only if this consumer dies
+        logger.error("redis.lease.ack.error", queue=queue, error=str(e))
+
+
+async def renew_lease(r: Redis, queues: List[str], ttl_sec: float) -> None:
+    deadline = _deadline_ms(ttl_sec)
+    async with r.pipeline(transaction=False) as pipe:
+        for q in queues:
+            pipe.zadd(leases_key(q), {consumer_id(): deadline})
+        await pipe.execute()
+
+
+async def reap_expired(r: Redis, queues: List[str], limit: int = 20) -> int:
+    """Requeue the jobs of consumers whose lease expired."""
+    script = r.register_script(_REAP_LUA)
+    moved = 0
+    for q in queues:
+        n = int(await script(keys=[leases_key(q), q], args=[int(time.time() * 1000), processing_key(q, ""), limit]))
+        if n:
+            logger.warn("redis.lease.reaped", queue=q, count=n)
+        moved += n
+    return moved
+
+
+async def release_leases(r: Redis, queues: List[str]) -> int:
+    """Hand back everything this consumer still holds (clean shutdown)."""
+    script = r.register_script(_REAP_LUA)
+    moved = 0
+    for q in queues:
+        moved += int(await script(keys=[leases_key(q), q],
+                                  args=[int(time.time() * 1000), processing_key(q, ""), 20, consumer_id()]))
+    return moved
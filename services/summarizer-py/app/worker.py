@@ -1,11 +1,16 @@
 import asyncio
 import json
+import random
 import time
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 from .config import config
 from .logging import logger
-from .redis_io import redis_client, read_job, to_list, set_idempotency
+from .redis_io import (
+    redis_client, read_job, to_list, schedule_retry, promote_due,
+    claim_article, renew_claim, mark_done, release_claim,
+    lease_job, ack, renew_lease, reap_expired, release_leases,
+)
 from .model_client import summarize_with_llm, LLMError
 from .schemas import SummarizerIn, SummarizerOut
 
@@ -13,12 +18,57 @@ from .schemas import SummarizerIn, SummarizerOut
 LAST_LLM_OK_AT_MS: int = 0
 
 
+def _queues() -> List[str]:
+    return [config.RETRY_QUEUE, config.INPUT_QUEUE]
+
+
 async def process_one(r) -> None:
-    # Prefer retry queue first, then new jobs
-    payload = await read_job(r, [config.RETRY_QUEUE, config.INPUT_QUEUE])
-    if not payload:
+    # Prefer retry queue first (due retries only), then new jobs
+    await promote_due(r, config.RETRY_QUEUE)
+    if not config.LEASE_QUEUES:
+        payload = await read_job(r, _queues())
+        if payload:
+            await _process_payload(r, payload)
         return
-    
+
+    leased = await lease_job(r, _queues(), config.VISIBILITY_TIMEOUT_SEC)
+    if leased is None:
+        return
+    queue, raw, payload = leased
+    try:
+        if payload:
+            await _process_payload(r, payload)
+    except BaseException:
+        # unexpected failure (usually Redis): hand the job straight back rather
+        # than holding it until this worker dies
+        await release_leases(r, _queues())
+        raise
+    await ack(r, queue, raw)
+
+
+async def _lease_heartbeat(r) -> None:
+    """Renew this worker's lease and requeue jobs of workers whose lease lapsed."""
+    while True:
+        try:
+            await renew_lease(r, _queues(), config.VISIBILITY_TIMEOUT_SEC)
+            await reap_expired(r, _queues())
+        except Exception as e:
+            logger.error("worker.lease_heartbeat_error", err=str(e))
+        await asyncio.sleep(config.VISIBILITY_TIMEOUT_SEC / 3)
+
+
+async def _hold_claim(r, article_id: str) -> None:
+    """Keep this worker's claim alive while it summarizes (LLM calls can outlast VISIBILITY_TIMEOUT)."""
+    while True:
+        await asyncio.sleep(config.VISIBILITY_TIMEOUT_SEC / 3)
+        try:
+            if not await renew_claim(r, article_id, config.LLM_MODEL, config.VISIBILITY_TIMEOUT_SEC):
+                return
+        except Exception as e:
+            logger.error("job.claim_renew_error", article_id=article_id, err=str(e))
+
+
+async def _process_payload(r, payload: Dict[str, Any]) -> None:
     trace_id = (payload or {}).get("trace_id")
     attempt = int((payload or {}).get("attempt", 0))
 
@@ -31,64 +81,79 @@ async def process_one(r) -> None:
         await to_list(r, config.DLQ, {"reason": "SCHEMA_MISMATCH", "payload": payload, "err": str(e)})
         return
 
-    # Idempotency key: skip if already processed
-    done_key_new = await set_idempotency(r, sin.article.id, config.LLM_MODEL)
-    if not done_key_new:
+    # Idempotency: claim the article for this attempt; skip if already summarized
+    state = await claim_article(r, sin.article.id, config.LLM_MODEL, config.VISIBILITY_TIMEOUT_SEC)
+    if state == "done":
         logger.info("job.already_done", trace_id=trace_id, article_id=sin.article.id)
         return
+    if state == "in_progress":
+        # another worker holds the claim (or died holding it): look again once it
+        # has finished or the claim expired
+        payload["visible_at"] = int(time.time() * 1000) + config.VISIBILITY_TIMEOUT_SEC * 1000
+        await schedule_retry(r, config.RETRY_QUEUE, payload, payload["visible_at"])
+        logger.info("job.in_progress_elsewhere", trace_id=trace_id, article_id=sin.article.id)
+        return
 
     # Build LLM input
     llm_input = json.loads(SummarizerIn(**payload).model_dump_json())
 
-    # LLM call with simple retries
-    backoff = 0.5
-    last_err = None
-    for i in range(3):
-        try:
-            partial = await summarize_with_llm(llm_input)
-            latency_ms = int((time.time() - t0) * 1000)
-            # Assemble output
-            out = SummarizerOut(
-                trace_id=sin.trace_id,
-                story_id=sin.story.id,
-                article_id=sin.article.id,
-                model=config.LLM_MODEL,
-                lang=sin.article.language,
-                summary=partial.get("summary") or "",
-                classification=partial.get("classification") or {},
-                ui=partial.get("ui") or {},
-                embedding=None,  # future: optional
-                timestamps={"summarized_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())},
-                schema_version=config.JSON_SCHEMA_VERSION,
-            )
-            await to_list(r, config.OUTPUT_QUEUE, json.loads(out.model_dump_json()))
-            logger.info(
-                "job.completed",
-                trace_id=trace_id,
-                story_id=sin.story.id,
-                article_id=sin.article.id,
-                model=config.LLM_MODEL,
-                latency_ms=latency_ms,
-                attempt=attempt,
-            )
-            global LAST_LLM_OK_AT_MS
-            LAST_LLM_OK_AT_MS = int(time.time() * 1000)
-            return
-        except LLMError as e:
-            last_err = str(e)
-            await asyncio.sleep(backoff)
-            backoff *= 2
-        except Exception as e:
-            last_err = str(e)
-            break
-
-    # Failure path
+    # LLM call with simple retries, holding the claim until it ends
+    keepalive = asyncio.create_task(_hold_claim(r, sin.article.id))
+    try:
+        backoff = 0.5
+        last_err = None
+        for i in range(3):
+            try:
+                partial = await summarize_with_llm(llm_input)
+                latency_ms = int((time.time() - t0) * 1000)
+                # Assemble output
+                out = SummarizerOut(
+                    trace_id=sin.trace_id,
+                    story_id=sin.story.id,
+                    article_id=sin.article.id,
+                    model=config.LLM_MODEL,
+                    lang=sin.article.language,
+                    summary=partial.get("summary") or "",
+                    classification=partial.get("classification") or {},
+                    ui=partial.get("ui") or {},
+                    embedding=None,  # future: optional
+                    timestamps={"summarized_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())},
+                    schema_version=config.JSON_SCHEMA_VERSION,
+                )
+                await to_list(r, config.OUTPUT_QUEUE, json.loads(out.model_dump_json()))
+                await mark_done(r, sin.article.id, config.LLM_MODEL)
+                logger.info(
+                    "job.completed",
+                    trace_id=trace_id,
+                    story_id=sin.story.id,
+                    article_id=sin.article.id,
+                    model=config.LLM_MODEL,
+                    latency_ms=latency_ms,
+                    attempt=attempt,
+                )
+                global LAST_LLM_OK_AT_MS
+                LAST_LLM_OK_AT_MS = int(time.time() * 1000)
+                return
+            except LLMError as e:
+                last_err = str(e)
+                await asyncio.sleep(backoff)
+                backoff *= 2
+            except Exception as e:
+                last_err = str(e)
+                break
+    finally:
+        keepalive.cancel()
+
+    # Failure path: drop the claim so the retry (or a DLQ replay) can run
+    await release_claim(r, sin.article.id, config.LLM_MODEL)
     attempt += 1
     reason = "LLM_TIMEOUT" if last_err == "timeout" else ("JSON_PARSE" if "json_parse" in (last_err or "") else "UNKNOWN")
     if attempt < config.MAX_RETRIES:
+        delay_ms = int((2 ** attempt) * 1000 * (1.0 + random.random() * 0.25))
         payload["attempt"] = attempt
-        await to_list(r, config.RETRY_QUEUE, payload)
-        logger.warn("job.requeued", trace_id=trace_id, attempt=attempt, reason=reason)
+        payload["visible_at"] = int(time.time() * 1000) + delay_ms
+        await schedule_retry(r, config.RETRY_QUEUE, payload, payload["visible_at"])
+        logger.warn("job.requeued", trace_id=trace_id, attempt=attempt, reason=reason, delay_ms=delay_ms)
     else:
         await to_list(r, config.DLQ, {"reason": reason, "payload": payload, "err": last_err})
         logger.error("job.dlq", trace_id=trace_id, reason=reason, err=last_err)
@@ -96,15 +161,20 @@ async def process_one(r) -> None:
 
 async def worker_main() -> None:
     r = redis_client()
-    logger.info("worker.loop_started", redis_url=_mask_url(config.REDIS_URL))
+    logger.info("worker.loop_started", redis_url=_mask_url(config.REDIS_URL), leased=config.LEASE_QUEUES)
+    heartbeat = asyncio.create_task(_lease_heartbeat(r)) if config.LEASE_QUEUES else None
     count = 0
     # Simple single-threaded loop
-    while count< 5:
-        try:
-            await process_one(r)
-        except Exception as e:
-            logger.error("worker.loop_error", err=str(e))
-            await asyncio.sleep(0.5)
+    try:
+        while count< 5:
+            try:
+                await process_one(r)
+            except Exception as e:
+                logger.error("worker.loop_error", err=str(e))
+                await asyncio.sleep(0.5)
+    finally:
+        if heartbeat is not None:
+            heartbeat.cancel()
 
 
 def _mask_url(url: str) -> str: